@@ -0,0 +1,280 @@
+"""
+Micro-benchmarks for the data and script-generation hot paths.
+
+Runs headlessly: charts are attached to a window whose script_func only records
+what would have been sent to the webview.
+
+    python benchmarks/hotpaths.py --save baseline.json
+    python benchmarks/hotpaths.py --baseline baseline.json --tolerance 1.25
+
+Results are written as JSON. With --baseline, every benchmark slower than
+baseline * tolerance is reported and the exit code is 1.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lightweight_charts import abstract, timecodec  # noqa: E402
+from lightweight_charts.util import js_data, Dataset  # noqa: E402
+
+
+class RecordingWindow(abstract.Window):
+    def __init__(self):
+        super().__init__(self._record)
+        self.loaded = True
+        self.calls = 0
+        self.bytes = 0
+
+    def _record(self, script: str):
+        self.calls += 1
+        self.bytes += len(script.encode())
+
+    def reset(self):
+        self.calls = self.bytes = 0
+
+
+def make_bars(n: int, freq: str = 'min') -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    close = 100 + rng.standard_normal(n).cumsum()
+    open_ = np.concatenate(([100.0], close[:-1]))
+    spread = rng.random(n)
+    return pd.DataFrame({
+        'time': pd.date_range('2020-01-01', periods=n, freq=freq),
+        'open': open_,
+        'high': np.maximum(open_, close) + spread,
+        'low': np.minimum(open_, close) - spread,
+        'close': close,
+        'volume': rng.integers(1, 10_000, n),
+    })
+
+
+def new_chart(lines: int = 0):
+    window = RecordingWindow()
+    chart = abstract.AbstractChart(window)
+    for i in range(lines):
+        chart.create_line(f'line{i}')
+    return window, chart
+
+
+def measure(func, repeat: int, number: int = 1, setup=None):
+    timings = []
+    for _ in range(repeat):
+        state = setup() if setup else None
+        start = time.perf_counter()
+        for _ in range(number):
+            func(state)
+        timings.append((time.perf_counter() - start) / number)
+    return {'seconds': statistics.median(timings), 'min_seconds': min(timings)}
+
+
+def bench_set(n: int, lines: int, repeat: int):
+    df = make_bars(n)
+    for i in range(lines):
+        df[f'line{i}'] = df['close'].rolling(i + 2, min_periods=1).mean()
+
+    def setup():
+        window, chart = new_chart(lines)
+        window.reset()
+        return window, chart
+
+    sent = {}
+
+    def run(state):
+        window, chart = state
+        chart.set(df)
+        sent.update(calls=window.calls, bytes=window.bytes)
+
+    result = measure(run, repeat, setup=setup)
+    return {**result, 'bytes_per_op': sent['bytes'], 'scripts_per_op': sent['calls']}
+
+
+def bench_update(count: int, repeat: int):
+    df = make_bars(1000)
+    bars = make_bars(1000 + count).iloc[1000:].reset_index(drop=True)
+    rows = [bars.iloc[i] for i in range(count)]
+
+    def setup():
+        window, chart = new_chart()
+        chart.set(df)
+        window.reset()
+        return window, chart
+
+    sent = {}
+
+    def run(state):
+        window, chart = state
+        for row in rows:
+            chart.update(row)
+        sent.update(calls=window.calls, bytes=window.bytes)
+
+    result = measure(run, repeat, setup=setup)
+    return {**result, 'ops_per_second': count / result['seconds'],
+            'bytes_per_op': sent['bytes'] / count, 'scripts_per_op': sent['calls'] / count}
+
+
+def bench_update_from_tick(count: int, repeat: int):
+    df = make_bars(1000)
+    start = df['time'].iloc[-1]
+    ticks = [pd.Series({'time': start + pd.Timedelta(seconds=i), 'price': 100 + (i % 7), 'volume': 1})
+             for i in range(count)]
+
+    def setup():
+        window, chart = new_chart()
+        chart.set(df)
+        window.reset()
+        return window, chart
+
+    sent = {}
+
+    def run(state):
+        window, chart = state
+        for tick in ticks:
+            chart.update_from_tick(tick, cumulative_volume=True)
+        sent.update(calls=window.calls, bytes=window.bytes)
+
+    result = measure(run, repeat, setup=setup)
+    return {**result, 'ops_per_second': count / result['seconds'],
+            'bytes_per_op': sent['bytes'] / count, 'scripts_per_op': sent['calls'] / count}
+
+
+def bench_marker_list(count: int, repeat: int):
+    df = make_bars(count)
+    markers = [{'time': t, 'position': 'above', 'shape': 'arrow_down', 'color': '#f00', 'text': 'x'}
+               for t in df['time']]
+
+    def setup():
+        window, chart = new_chart()
+        chart.set(df)
+        window.reset()
+        return window, chart
+
+    sent = {}
+
+    def run(state):
+        window, chart = state
+        chart.marker_list(markers)
+        sent.update(bytes=window.bytes)
+
+    result = measure(run, repeat, setup=setup)
+    return {**result, 'bytes_per_op': sent['bytes']}
+
+
+def bench_serialization(n: int, repeat: int):
+    df = make_bars(n)
+    df['time'] = timecodec.to_seconds_array(df['time'])
+
+    def records(_):
+        return js_data(df)
+
+    def columns(_):
+        dataset = Dataset(df['time'])
+        dataset.add('s', {col: df[col] for col in ('open', 'high', 'low', 'close')})
+        return dataset.script()
+
+    return {
+        'js_data': {**measure(records, repeat), 'bytes_per_op': len(js_data(df))},
+        'dataset': {**measure(columns, repeat), 'bytes_per_op': len(columns(None))},
+    }
+
+
+def bench_set_interval(n: int, repeat: int):
+    ns = timecodec.to_nanoseconds_array(make_bars(n)['time'])
+
+    def setup():
+        return new_chart()[1]
+
+    def cold(chart):
+        chart._cadence = None
+        chart._use_cadence(chart._infer_cadence(ns))
+
+    def cached(chart):
+        chart._use_cadence(chart._infer_cadence(ns))
+
+    def warm():
+        chart = setup()
+        cold(chart)
+        return chart
+
+    return {
+        'cold': measure(cold, repeat, setup=setup),
+        'cached': measure(cached, repeat, setup=warm),
+    }
+
+
+def run_all(quick: bool = False):
+    sizes = (10_000, 100_000) if quick else (10_000, 100_000, 1_000_000)
+    repeat = 3 if quick else 5
+    results = {}
+    for n in sizes:
+        reps = repeat if n < 1_000_000 else 1
+        results[f'set[{n}]'] = bench_set(n, 0, reps)
+        results[f'set[{n},lines=10]'] = bench_set(n, 10, reps)
+        for name, value in bench_serialization(n, reps).items():
+            results[f'serialize.{name}[{n}]'] = value
+        for name, value in bench_set_interval(n, reps).items():
+            results[f'set_interval.{name}[{n}]'] = value
+    results['update[2000]'] = bench_update(2000, repeat)
+    results['update_from_tick[2000]'] = bench_update_from_tick(2000, repeat)
+    results['marker_list[10000]'] = bench_marker_list(10_000, repeat)
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'timestamp': time.time(),
+        },
+        'results': results,
+    }
+
+
+def compare(current: dict, baseline: dict, tolerance: float):
+    regressions = []
+    for name, result in current['results'].items():
+        before = baseline['results'].get(name)
+        if not before:
+            continue
+        ratio = result['seconds'] / before['seconds']
+        line = f'{name:40} {before["seconds"] * 1e3:10.3f}ms -> {result["seconds"] * 1e3:10.3f}ms  x{ratio:.2f}'
+        if ratio > tolerance:
+            regressions.append(line)
+        print(line)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--quick', action='store_true', help='skip the 1M bar sizes')
+    parser.add_argument('--save', help='write the results to this JSON file')
+    parser.add_argument('--baseline', help='compare against a JSON file written by --save')
+    parser.add_argument('--tolerance', type=float, default=1.25, help='allowed slowdown ratio')
+    args = parser.parse_args(argv)
+
+    current = run_all(args.quick)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(current, f, indent=2)
+    if not args.baseline:
+        print(json.dumps(current, indent=2))
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(current, baseline, args.tolerance)
+    if regressions:
+        print(f'\n{len(regressions)} benchmark(s) slower than x{args.tolerance}:')
+        print('\n'.join(regressions))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
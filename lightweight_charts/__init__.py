@@ -1,2 +1,5 @@
 from .abstract import AbstractChart, Window
-from .chart import Chart
+from .chart import Chart, AsyncChart
+from .transport import Transport, HeadlessTransport, WebSocketTransport
+from .server import ChartServer
+from .prefetch import Prefetcher
@@ -1,15 +1,27 @@
 import asyncio
+import json
 import os
+import sys
+import threading
+from contextlib import nullcontext
 from base64 import b64decode
 from datetime import datetime
+from itertools import count
 from typing import Union, Literal, List, Optional
+import numpy as np
 import pandas as pd
 
+from . import timecodec
+from .cache import PayloadCache, payload_size
+from .dispatch import check_cancelled
+from .metrics import Metrics, queue_depth, to_prometheus
+from .progressive import ProgressiveLoad
+from .replay import Replay
 from .topbar import TopBar
 from .util import (
-    IDGen, jbool, Pane, Events, TIME, NUM, FLOAT,
+    IDGen, Registry, ScriptBuffer, StateLog, jbool, Pane, Events, TIME, NUM, FLOAT,
     LINE_STYLE, MARKER_POSITION, MARKER_SHAPE, CROSSHAIR_MODE, PRICE_SCALE_MODE,
-    line_style, marker_position, marker_shape, crosshair_mode, price_scale_mode, js_data,
+    line_style, marker_position, marker_shape, crosshair_mode, price_scale_mode, js_data, Dataset,
 )
 
 JS = {}
@@ -52,48 +64,160 @@ TEMPLATE = f"""
 
 class Window:
     _id_gen = IDGen()
-    handlers = {}
 
-    def __init__(self, script_func: callable = None, js_api_code: str = None, run_script: callable = None):
+    def __init__(self, script_func: callable = None, js_api_code: str = None, run_script: callable = None,
+                 handlers: dict = None, transport=None):
+        """
+        :param transport: a `Transport` carrying scripts to the page and events back;
+        supersedes `script_func` and `js_api_code`.
+        """
+        if transport is not None:
+            script_func, js_api_code = transport.send, transport.js_api_code
+        self.transport = transport
         self.loaded = False
         self.script_func = script_func
-        self.scripts = []
-        self.final_scripts = []
+        self.batch_func = transport.send_batch if transport is not None else None
+        self.scripts = ScriptBuffer()
+        self.final_scripts = ScriptBuffer()
+        self.registry = Registry(self, handlers)
+        self.handlers = self.registry.handlers
+        self.state = StateLog()
+        self.restored = {}
+        # Prepared `set` payloads; None disables the cache.
+        self.payloads: Optional[PayloadCache] = PayloadCache()
+        # The serialized bytes of the datasets kept in the page by `load_dataset`.
+        self.dataset_budget = 128 * 2 ** 20
+        # Handlers dispatched to threads may run scripts concurrently.
+        self._lock = threading.Lock()
+        # Guards the read-modify-write of series data, which progressive loads merge from their thread.
+        self._data_lock = threading.RLock()
+        self.tracer = None
+        self.metrics = None
+        self.queues = transport.queues() if transport is not None else {}
+        if transport is not None:
+            transport.attach(self)
 
         if run_script:
             self.run_script = run_script
 
         if js_api_code:
-            self.run_script(f'window.callbackFunction = {js_api_code}')
+            self.run_script(f'window.callbackFunction = {js_api_code}', key=('callback', 'window'))
 
     def on_js_load(self):
+        with self._lock:
+            self._flush_buffer()
+
+    def _flush_buffer(self):
         if self.loaded:
             return
         self.loaded = True
 
         # 优化：批量执行脚本，减少单独调用开销
         try:
-            if self.scripts:
-                combined_script = '\n'.join(self.scripts)
-                self.script_func(combined_script)
-
-            if self.final_scripts:
-                combined_final_script = '\n'.join(self.final_scripts)
-                self.script_func(combined_final_script)
+            with self.timer('transport'):
+                if self.batch_func is not None:
+                    # Transports receive the keys too, e.g. to compact the history they replay.
+                    items = self.scripts.items() + self.final_scripts.items()
+                    if items:
+                        self.batch_func([script for script, _ in items], [key for _, key in items])
+                else:
+                    if self.scripts:
+                        combined_script = '\n'.join(self.scripts)
+                        self.script_func(combined_script)
+                    if self.final_scripts:
+                        combined_final_script = '\n'.join(self.final_scripts)
+                        self.script_func(combined_final_script)
         except Exception as e:
             # 如果批量执行失败，回退到逐个执行
             print(f"批量执行失败，回退到逐个执行: {e}")
             [self.script_func(script) for script in self.scripts]
             [self.script_func(script) for script in self.final_scripts]
+        self.scripts.clear()
+        self.final_scripts.clear()
+
+    def run_script(self, script: str, run_last: bool = False, key: tuple = None, record: bool = True):
+        """
+        For advanced users; evaluates JavaScript within the Webview.\n
+        :param key: (operation, target, ...). Before the page loads, a script with a key
+        replaces the previous script with the same key.
+        :param record: keeps the script in `state`, the log chart snapshots are built from.
+        """
+        check_cancelled()
+        if self.metrics:
+            caller = sys._getframe(1)
+            owner = getattr(caller.f_locals.get('self'), 'id', 'window')
+            self.metrics.script(owner, caller.f_code.co_name, script)
+        with self._lock:
+            if record:
+                self.state.record(script, key)
+            if self.loaded:
+                if self.tracer and not script.startswith('_~_~RETURN~_~_'):
+                    script = self.tracer.wrap(script)
+                if self.metrics:
+                    with self.metrics.timer('transport'):
+                        self._send(script, key)
+                else:
+                    self._send(script, key)
+                return
+            self.scripts.append(script, key) if not run_last else self.final_scripts.append(script)
 
-    def run_script(self, script: str, run_last: bool = False):
+    def record(self, script: str, key: tuple = None):
         """
-        For advanced users; evaluates JavaScript within the Webview.
+        Adds a script to `state` without sending it, for a change the page made itself.
         """
-        if self.loaded:
+        with self._lock:
+            self.state.record(script, key)
+
+    def _send(self, script: str, key: tuple = None):
+        if self.transport is not None:
+            self.script_func(script, key)
+        else:
             self.script_func(script)
-            return
-        self.scripts.append(script) if not run_last else self.final_scripts.append(script)
+
+    def evaluate(self, script: str):
+        """
+        Evaluates a JavaScript expression within the page and returns its result.
+        """
+        if self.transport is None:
+            raise NotImplementedError('This window has no transport to return results through.')
+        return self.transport.evaluate(script)
+
+    def pin(self, target: str):
+        """
+        Keeps the queued scripts of `target` from being superseded, as a script reading its state follows.
+        """
+        if not self.loaded:
+            self.scripts.pin(target)
+        elif self.transport is not None:
+            self.transport.pin(target)
+
+    def enable_metrics(self, enabled: bool = True):
+        """
+        Starts (or stops) collecting the script, handler and timing metrics returned by `stats`.
+        """
+        self.metrics = Metrics() if enabled else None
+
+    def timer(self, name: str):
+        """
+        Times a block into the `name` timing while metrics are enabled.
+        """
+        return self.metrics.timer(name) if self.metrics else nullcontext()
+
+    def stats(self, format: Literal['dict', 'prometheus'] = 'dict'):
+        """
+        Queue depths, live JS objects and payload cache statistics, plus, while metrics are enabled, the scripts and bytes sent
+        per pane and method, handler calls and durations, and serialization and transport time.\n
+        :param format: 'dict', or 'prometheus' for the Prometheus text exposition format.
+        """
+        counts = self.registry.counts()
+        stats = {
+            'queues': {name: queue_depth(queue) for name, queue in self.queues.items()},
+            'objects': counts['objects'],
+            'handlers_registered': counts['handlers'],
+            'payload_cache': self.payloads.stats() if self.payloads is not None else None,
+            **(self.metrics.snapshot() if self.metrics else {'scripts': None}),
+        }
+        return to_prometheus(stats) if format == 'prometheus' else stats
 
 
 
@@ -109,7 +233,7 @@ class Window:
         {subchart.id}.chart.timeScale().setVisibleLogicalRange(
             {sync_id}.chart.timeScale().getVisibleLogicalRange()
         )
-        ''', run_last=True)
+        ''', run_last=True, key=('sync', subchart.id))
         return subchart
 
     def style(self, background_color: str = '#0c0d0f', hover_background_color: str = '#3c434c',
@@ -127,7 +251,7 @@ class Window:
             borderColor: '{border_color}',
             color: '{color}',
             activeColor: '{active_color}', 
-        }}''')
+        }}''', key=('style', 'window'))
 
 
 class SeriesCommon(Pane):
@@ -142,42 +266,34 @@ class SeriesCommon(Pane):
         self.name = name
         self.num_decimals = 2
         self.offset = 0
+        self._cadence = None
+        self._markers = {}
         self.data = pd.DataFrame()
-
-    def _set_interval(self, df: pd.DataFrame):
-        if not pd.api.types.is_datetime64_any_dtype(df['time']):
-            df['time'] = pd.to_datetime(df['time'])
-        common_interval = df['time'].diff().value_counts()
-        if common_interval.empty:
+        # Whether the page mirrors the data in `{id}.data`; see `set(copy=False)`.
+        self._mirrored = True
+        # (max_bars, max_age, batch); see `retention`.
+        self._retention = None
+
+    def _infer_cadence(self, ns, interval=None) -> Optional[timecodec.Cadence]:
+        if interval is not None:
+            return timecodec.Cadence.from_hint(interval, ns)
+        return timecodec.Cadence.infer(ns, self._cadence)
+
+    def _use_cadence(self, cadence: Optional[timecodec.Cadence]):
+        if cadence is None:
             return
-        self._interval = common_interval.index[0].total_seconds()
-
-        units = [
-            pd.Timedelta(microseconds=df['time'].dt.microsecond.value_counts().index[0]),
-            pd.Timedelta(seconds=df['time'].dt.second.value_counts().index[0]),
-            pd.Timedelta(minutes=df['time'].dt.minute.value_counts().index[0]),
-            pd.Timedelta(hours=df['time'].dt.hour.value_counts().index[0]),
-            pd.Timedelta(days=df['time'].dt.day.value_counts().index[0]),
-        ]
-        self.offset = 0
-        for value in units:
-            value = value.total_seconds()
-            if value == 0:
-                continue
-            elif value >= self._interval:
-                break
-            self.offset = value
-            break
+        self._cadence = cadence
+        self._interval, self.offset = cadence.interval, cadence.offset
 
         self.run_script(
-            f'if ({self.id}.toolBox) {self.id}.interval = {self._interval}'
+            f'if ({self.id}.toolBox) {self.id}.interval = {self._interval}', key=('interval', self.id)
         )
 
     def _push_to_legend(self):
         self.run_script(f'''
         {self._chart.id}.lines.push({self.id})
         {self._chart.id}.legend.lines.push({self._chart.id}.legend.makeLineRow({self.id}))
-        ''')
+        ''', key=('legend_row', self.id))
 
     @staticmethod
     def _format_labels(data, labels, index, exclude_lowercase):
@@ -194,15 +310,23 @@ class SeriesCommon(Pane):
             labels = [*labels, 'time']
         return labels
 
-    def _df_datetime_format(self, df: pd.DataFrame, exclude_lowercase=None):
-        df = df.copy()
-        df.columns = self._format_labels(df, df.columns, df.index, exclude_lowercase)
-        self._set_interval(df)
-        if not pd.api.types.is_datetime64_any_dtype(df['time']):
-            df['time'] = pd.to_datetime(df['time'])
-        df['time'] = df['time'].astype('int64') // 10 ** 9
+    def _df_datetime_format(self, df: pd.DataFrame, exclude_lowercase=None, interval=None, copy=True):
+        df, cadence = self._df_time_columns(df, exclude_lowercase, interval, copy)
+        self._use_cadence(cadence)
         return df
 
+    def _df_time_columns(self, df: pd.DataFrame, exclude_lowercase=None, interval=None, copy=True):
+        """
+        :param copy: False formats `df` in place.
+        :return: the frame with its times in epoch seconds, and its cadence; the series' own cadence is unchanged.
+        """
+        if copy:
+            df = df.copy()
+        df.columns = self._format_labels(df, df.columns, df.index, exclude_lowercase)
+        ns = timecodec.to_nanoseconds_array(df['time'])
+        df['time'] = ns // 10 ** 9
+        return df, self._infer_cadence(ns, interval)
+
     def _series_datetime_format(self, series: pd.Series, exclude_lowercase=None):
         series = series.copy()
         series.index = self._format_labels(series, series.index, series.name, exclude_lowercase)
@@ -210,46 +334,204 @@ class SeriesCommon(Pane):
         return series
 
     def _single_datetime_format(self, arg):
-        if isinstance(arg, (str, int, float)) or not pd.api.types.is_datetime64_any_dtype(arg):
-            try:
-                arg = pd.to_datetime(arg, unit='ms')
-            except ValueError:
-                arg = pd.to_datetime(arg)
-        arg = self._interval * (arg.timestamp() // self._interval)+self.offset
-        return arg
-
-    def set(self, df: pd.DataFrame = None, format_cols: bool = True):
+        return timecodec.floor(timecodec.to_seconds(arg), self._interval, self.offset)
+
+    def _array_datetime_format(self, values):
+        return timecodec.floor_array(timecodec.to_seconds_array(values), self._interval, self.offset)
+
+    def set(self, df: pd.DataFrame = None, format_cols: bool = True, interval: Union[NUM, str] = None,
+            cache_key=None, copy: bool = True):
+        """
+        Sets the data of the series.\n
+        :param interval: The bar interval in seconds (or a string such as '1h'). Skips interval detection.
+        :param cache_key: identifies `df` in the payload cache instead of its fingerprint.
+        :param copy: False hands `df` over to the series, which formats it in place and keeps it as its
+        data; the frame must not be used afterwards. The page then keeps the data in the series alone,
+        without the `data` mirror, and nothing is cached.
+        """
         if df is None or df.empty:
-            self.run_script(f'{self.id}.series.setData([])')
+            self.run_script(f'{self.id}.series.setData([])', key=('data', self.id))
             self.data = pd.DataFrame()
             return
+        cache = self.win.payloads if copy else None
+        key = cache.key(df, cache_key, self.id, self.name, format_cols, interval) if cache is not None else None
+        entry = cache.get(key) if cache is not None else None
+        if entry is not None:
+            df, cadence, script = entry
+            self._use_cadence(cadence)
+            self._store(df)
+            self._mirrored = True
+            self.run_script(script, key=('data', self.id))
+            return
         if format_cols:
-            df = self._df_datetime_format(df, exclude_lowercase=self.name)
+            df = self._df_datetime_format(df, exclude_lowercase=self.name, interval=interval, copy=copy)
         if self.name:
             if self.name not in df:
                 raise NameError(f'No column named "{self.name}".')
-            df = df.rename(columns={self.name: 'value'})
-        self.data = df.copy()
+            if copy:
+                df = df.rename(columns={self.name: 'value'})
+            else:
+                df.rename(columns={self.name: 'value'}, inplace=True)
+        self._store(df, copy)
+        self._mirrored = copy
+        dataset = Dataset(df['time'])
+        self._add_to_dataset(dataset, df, mirror=copy)
+        with self.win.timer('serialization'):
+            script = dataset.script()
+        if cache is not None:
+            cache.put(key, (df, self._cadence if format_cols else None, script), payload_size(df, script))
+        self.run_script(script if copy else f'{self.id}.data = null\n{script}', key=('data', self.id))
+
+    def _store(self, df: pd.DataFrame, copy=True):
+        self.data = df.copy() if copy else df
         self._last_bar = df.iloc[-1]
-        self.run_script(f'{self.id}.data = {js_data(df)}; {self.id}.series.setData({self.id}.data); ')
+
+    def _add_to_dataset(self, dataset: Dataset, df: pd.DataFrame, mirror=True):
+        dataset.add(
+            f'{self.id}.series', {col: df[col] for col in df.columns if col != 'time'}, mirror=self.id if mirror else None
+        )
+
+    def _data_script(self, data: pd.DataFrame = None) -> str:
+        """
+        The script setting the series to its current data, for state snapshots.
+        """
+        data = self.data if data is None else data
+        if data.empty:
+            return f'{self.id}.series.setData([])'
+        if self._last_bar is not None:
+            # The stored last row only catches up with the last bar when the next bar arrives; see `update`.
+            data = data.copy()
+            data.loc[data.index[-1]] = self._last_bar
+        dataset = Dataset(data['time'])
+        self._add_to_dataset(dataset, data, mirror=self._mirrored)
+        return dataset.script()
+
+    def _markers_script(self) -> str:
+        """
+        The script setting the markers of the series to its current markers, for state snapshots.
+        """
+        return f'{self.id}.markers.replace({json.dumps(list(self._markers.values()))})' if self._markers else ''
 
     def update(self, series: pd.Series):
         series = self._series_datetime_format(series, exclude_lowercase=self.name)
         if self.name in series.index:
             series.rename({self.name: 'value'}, inplace=True)
-        if self._last_bar is not None and series['time'] != self._last_bar['time']:
-            self.data.loc[self.data.index[-1]] = self._last_bar
-            self.data = pd.concat([self.data, series.to_frame().T], ignore_index=True)
-        self._last_bar = series
-        bar = js_data(series)
+        new_bar = self._last_bar is not None and series['time'] != self._last_bar['time']
+        with self.win._data_lock:
+            if new_bar:
+                self.data.loc[self.data.index[-1]] = self._last_bar
+                self.data = pd.concat([self.data, series.to_frame().T], ignore_index=True)
+            self._last_bar = series
+            if new_bar:
+                self._retain()
+        with self.win.timer('serialization'):
+            bar = js_data(series)
+        self.win.pin(self.id)
+        if not self._mirrored:
+            self.run_script(f'{self.id}.series.update({bar})', key=('update', self.id))
+            return
         self.run_script(f'''
             if (stampToDate(lastBar({self.id}.data).time).getTime() === stampToDate({series['time']}).getTime()) {{
                 {self.id}.data[{self.id}.data.length-1] = {bar}
             }}
             else {self.id}.data.push({bar})
             {self.id}.series.update({bar})
-        ''')
-        self.run_script(f'{self.id}.series.update({js_data(series)})')
+        ''', key=('update', self.id))
+        self.run_script(f'{self.id}.series.update({js_data(series)})', key=('update', self.id))
+
+    def _make_markers(self, markers: list, times: list = None) -> list:
+        if times is None:
+            times = self._array_datetime_format([marker['time'] for marker in markers]).tolist()
+        made = []
+        for time, marker in zip(times, markers):
+            made.append({
+                'time': time,
+                'position': marker_position(marker.get('position', 'below')),
+                'color': marker.get('color', '#2196F3'),
+                'shape': marker_shape(marker.get('shape', 'arrow_up')),
+                'text': marker.get('text', ''),
+                'id': self.win._id_gen.generate(),
+            })
+        self._markers.update((marker['id'], marker) for marker in made)
+        return made
+
+    def _restored(self):
+        for marker_id in self._markers:
+            self.win._id_gen.add(marker_id[7:])
+
+    def retention(self, max_bars: int = None, max_age: Union[NUM, str] = None, batch: float = 0.1):
+        """
+        Keeps a rolling window of data, for charts streaming around the clock: the bars before the last
+        `max_bars`, or older than `max_age` before the last bar, are dropped in Python and in the page as
+        new bars arrive, with the markers placed on them. The lines, histograms, trend lines and vertical
+        spans of a chart are trimmed with it.\n
+        Bars are dropped once the window is exceeded by `batch` of its size, so trimming is amortized.
+        :param max_age: seconds, pd.Timedelta or a string such as '7d'.
+        """
+        if max_age is not None and not isinstance(max_age, (int, float)):
+            max_age = pd.Timedelta(max_age).total_seconds()
+        self._retention = (max_bars, max_age, batch) if max_bars or max_age else None
+        self._retain()
+
+    def _stored_data(self) -> pd.DataFrame:
+        return self.data
+
+    def _store_data(self, df: pd.DataFrame):
+        self.data = df
+
+    def _append_bars(self, bars: pd.DataFrame) -> int:
+        """
+        Adds bars in time order to the stored data; the first replaces the last bar if it has the same time.\n
+        :return: the number of bars added.
+        """
+        merged = self._last_bar is not None and bars['time'].iat[0] == self._last_bar['time']
+        new_bars = bars.iloc[1:] if merged else bars
+        with self.win._data_lock:
+            data = self._stored_data()
+            if len(new_bars):
+                if data.empty:
+                    self._store_data(new_bars.reset_index(drop=True))
+                else:
+                    data.loc[data.index[-1]] = bars.iloc[0] if merged else self._last_bar
+                    self._store_data(pd.concat([data, new_bars], ignore_index=True))
+            self._last_bar = bars.iloc[-1].copy()
+        return len(new_bars)
+
+    def _retain(self):
+        with self.win._data_lock:
+            data = self._stored_data()
+            if self._retention is None or data.empty:
+                return
+            max_bars, max_age, batch = self._retention
+            times = data['time']
+            cutoffs = []
+            if max_bars and len(times) > max_bars + max(1, int(max_bars * batch)):
+                cutoffs.append(float(times.iloc[-max_bars]))
+            last = float(self._last_bar['time'])
+            if max_age and times.iloc[0] < last - max_age * (1 + batch):
+                cutoffs.append(last - max_age)
+            if cutoffs:
+                self._trim(max(cutoffs))
+
+    def _trim(self, cutoff: float):
+        """
+        Drops the bars and markers before `cutoff`.
+        """
+        self._trim_rows(cutoff)
+        self.win.pin(self.id)
+        self.run_script(f'trimSeries({self.id}, {cutoff})', key=('update', self.id))
+        expired = [marker_id for marker_id, marker in self._markers.items() if marker['time'] < cutoff]
+        if expired:
+            self.remove_markers(expired)
+
+    def _trim_rows(self, cutoff: float):
+        if 'time' in self.data:
+            self.data = self.data[self.data['time'] >= cutoff].reset_index(drop=True)
+
+    def _release_markers(self):
+        for marker_id in self._markers:
+            self.win._id_gen.release(marker_id)
+        self._markers.clear()
 
     def marker_list(self, markers: list):
         """
@@ -262,19 +544,23 @@ class SeriesCommon(Pane):
         ]
         :return: a list of marker ids.
         """
-        markers = markers.copy()
-        marker_ids = []
-        for i, marker in enumerate(markers):
-            markers[i]['time'] = self._single_datetime_format(markers[i]['time'])
-            markers[i]['position'] = marker_position(markers[i]['position'])
-            markers[i]['shape'] = marker_shape(markers[i]['shape'])
-            markers[i]['id'] = self.win._id_gen.generate()
-            marker_ids.append(markers[i]['id'])
-        self.run_script(f"""
-            {self.id}.markers.push(...{markers})
-            {self.id}.series.setMarkers({self.id}.markers)
-        """)
-        return marker_ids
+        if not markers:
+            return []
+        markers = self._make_markers(markers)
+        with self.win.timer('serialization'):
+            script = f'{self.id}.markers.add({json.dumps(markers)})'
+        self.run_script(script, key=('markers', self.id))
+        return [marker['id'] for marker in markers]
+
+    def set_markers(self, markers: list):
+        """
+        Replaces every marker on the series with the given list (in the same format as `marker_list`).\n
+        :return: a list of marker ids.
+        """
+        self._release_markers()
+        markers = self._make_markers(markers) if markers else []
+        self.run_script(f'{self.id}.markers.replace({json.dumps(markers)})', key=('markers', self.id))
+        return [marker['id'] for marker in markers]
 
     def marker(self, time: datetime = None, position: MARKER_POSITION = 'below',
                shape: MARKER_SHAPE = 'arrow_up', color: str = '#2196F3', text: str = ''
@@ -289,33 +575,34 @@ class SeriesCommon(Pane):
         :return: The id of the marker placed.
         """
         try:
-            time = self._last_bar['time'] if not time else self._single_datetime_format(time)
+            time = float(self._last_bar['time']) if not time else self._single_datetime_format(time)
         except TypeError:
             raise TypeError('Chart marker created before data was set.')
-        marker_id = self.win._id_gen.generate()
-        self.run_script(f"""
-            {self.id}.markers.push({{
-                time: {time if isinstance(time, float) else f"'{time}'"},
-                position: '{marker_position(position)}',
-                color: '{color}',
-                shape: '{marker_shape(shape)}',
-                text: '{text}',
-                id: '{marker_id}'
-                }});
-            {self.id}.series.setMarkers({self.id}.markers)""")
-        return marker_id
+        marker, = self._make_markers(
+            [{'position': position, 'shape': shape, 'color': color, 'text': text}], times=[time])
+        self.run_script(f'{self.id}.markers.add([{json.dumps(marker)}])', key=('markers', self.id))
+        return marker['id']
 
     def remove_marker(self, marker_id: str):
         """
         Removes the marker with the given id.\n
         """
-        self.run_script(f'''
-           {self.id}.markers.forEach(function (marker) {{
-               if ('{marker_id}' === marker.id) {{
-                   {self.id}.markers.splice({self.id}.markers.indexOf(marker), 1)
-                   {self.id}.series.setMarkers({self.id}.markers)
-                   }}
-            }});''')
+        self.remove_markers([marker_id])
+
+    def remove_markers(self, marker_ids: list):
+        """
+        Removes the markers with the given ids.\n
+        """
+        for marker_id in marker_ids:
+            self._markers.pop(marker_id, None)
+            self.win._id_gen.release(marker_id)
+        self.run_script(f'{self.id}.markers.remove({json.dumps(list(marker_ids))})', key=('markers', self.id))
+
+    def visible_range_markers(self, enabled: bool = True):
+        """
+        Only passes the markers within the visible time range to the chart, updating them as it scrolls.
+        """
+        self.run_script(f'{self.id}.markers.setVisibleOnly({jbool(enabled)})', key=('visible_markers', self.id))
 
     def horizontal_line(self, price: NUM, color: str = 'rgb(122, 146, 202)', width: int = 2,
                         style: LINE_STYLE = 'solid', text: str = '', axis_label_visible: bool = True,
@@ -330,25 +617,26 @@ class SeriesCommon(Pane):
         """
         Removes a horizontal line at the given price.
         """
-        self.run_script(f'''
-        {self.id}.horizontal_lines.forEach(function (line) {{
-            if ({price} === line.price) line.deleteLine()
-        }})''')
+        for line in self._horizontal_lines():
+            if line.price == price:
+                line.delete()
 
     def clear_markers(self):
         """
         Clears the markers displayed on the data.\n
         """
-        self.run_script(f'''{self.id}.markers = []; {self.id}.series.setMarkers([])''')
+        self._release_markers()
+        self.run_script(f'{self.id}.markers.clear()', key=('markers', self.id))
 
     def clear_horizontal_lines(self):
         """
         Clears the horizontal lines displayed on the data.\n
         """
-        self.run_script(f'''
-        {self.id}.horizontal_lines.forEach(function (line) {{{self.id}.series.removePriceLine(line.line);}});
-        {self.id}.horizontal_lines = [];
-        ''')
+        for line in self._horizontal_lines():
+            line.delete()
+
+    def _horizontal_lines(self) -> list:
+        return [pane for pane in self.win.registry.panes() if isinstance(pane, HorizontalLine) and pane._chart is self]
 
     def price_line(self, label_visible: bool = True, line_visible: bool = True, title: str = ''):
         self.run_script(f'''
@@ -356,7 +644,7 @@ class SeriesCommon(Pane):
             lastValueVisible: {jbool(label_visible)},
             priceLineVisible: {jbool(line_visible)},
             title: '{title}',
-        }})''')
+        }})''', key=('price_line', self.id))
 
     def precision(self, precision: int):
         """
@@ -367,7 +655,7 @@ class SeriesCommon(Pane):
         {self.id}.precision = {precision}
         {self.id}.series.applyOptions({{
             priceFormat: {{precision: {precision}, minMove: {1 / (10 ** precision)}}}
-        }})''')
+        }})''', key=('precision', self.id))
         self.num_decimals = precision
 
     def hide_data(self):
@@ -380,18 +668,22 @@ class SeriesCommon(Pane):
         self.run_script(f'''
         {self.id}.series.applyOptions({{visible: {jbool(arg)}}})
         if ('volumeSeries' in {self.id}) {self.id}.volumeSeries.applyOptions({{visible: {jbool(arg)}}})
-        ''')
+        ''', key=('visible', self.id))
 
     def vertical_span(self, start_time: Union[TIME, tuple, list], end_time: TIME = None,
                       color: str = 'rgba(252, 219, 3, 0.2)', round: bool = False):
         """
         Creates a vertical line or span across the chart.\n
         Start time and end time can be used together, or end_time can be
-        omitted and a single time or a list of times can be passed to start_time.
+        omitted and a single time or a list (or array, Index or Series) of times can be passed to start_time.
         """
-        if round:
-            start_time = self._single_datetime_format(start_time)
-            end_time = self._single_datetime_format(end_time) if end_time else None
+        if isinstance(start_time, (tuple, list, np.ndarray, pd.Index, pd.Series)):
+            start_time = (self._array_datetime_format(start_time) if round
+                          else timecodec.to_seconds_array(start_time)).tolist()
+        else:
+            start_time = self._single_datetime_format(start_time) if round else timecodec.to_seconds(start_time)
+        if end_time is not None:
+            end_time = self._single_datetime_format(end_time) if round else timecodec.to_seconds(end_time)
         return VerticalSpan(self, start_time, end_time, color)
 
 
@@ -399,49 +691,66 @@ class HorizontalLine(Pane):
     def __init__(self, chart, price, color, width, style, text, axis_label_visible, func):
         super().__init__(chart.win)
         self.price = price
+        self.func = func
+        self._chart = chart
         self.run_script(f'''
         {self.id} = new HorizontalLine(
             {chart.id}, '{self.id}', {price}, '{color}', {width},
             {line_style(style)}, {jbool(axis_label_visible)}, '{text}'
-        )''')
+        )''', key=('create', self.id))
         if not func:
             return
+        self._bind()
+        self.run_script(f'if ("toolBox" in {chart.id}) {chart.id}.toolBox.drawings.push({self.id})', key=('toolbox', self.id))
 
+    def _bind(self):
         def wrapper(p):
-            self.price = float(p)
-            func(chart, self)
+            self._moved(float(p))
+            if self.func:
+                self.func(self._chart, self)
 
         async def wrapper_async(p):
-            self.price = float(p)
-            await func(chart, self)
+            self._moved(float(p))
+            await self.func(self._chart, self)
 
-        self.win.handlers[self.id] = wrapper_async if asyncio.iscoroutinefunction(func) else wrapper
-        self.run_script(f'if ("toolBox" in {chart.id}) {chart.id}.toolBox.drawings.push({self.id})')
+        self.win.registry.add_handler(
+            self.id, self.id, wrapper_async if asyncio.iscoroutinefunction(self.func) else wrapper)
+
+    def _moved(self, price: float):
+        self.price = price
+        # The line was dragged on the page; the state log moves it there on restore.
+        self.win.record(f'{self.id}.updatePrice({price})', ('price', self.id))
+
+    def _restored(self):
+        # Callbacks are not saved in snapshots; assign `func` again to handle the line being moved.
+        self.func = None
+        self._bind()
 
     def update(self, price):
         """
         Moves the horizontal line to the given price.
         """
-        self.run_script(f'{self.id}.updatePrice({price})')
+        self.run_script(f'{self.id}.updatePrice({price})', key=('price', self.id))
         self.price = price
 
     def label(self, text: str):
-        self.run_script(f'{self.id}.updateLabel("{text}")')
+        self.run_script(f'{self.id}.updateLabel("{text}")', key=('label', self.id))
 
     def delete(self):
         """
         Irreversibly deletes the horizontal line.
         """
-        self.run_script(f'{self.id}.deleteLine()')
-        del self
+        self.run_script(f'{self.id}.deleteLine(); delete {self.id}', key=('delete', self.id))
+        self.win.registry.release(self.id)
 
 
 class VerticalSpan(Pane):
-    def __init__(self, series: 'SeriesCommon', start_time: Union[TIME, tuple, list], end_time: TIME = None,
+    def __init__(self, series: 'SeriesCommon', start_time: Union[NUM, list], end_time: NUM = None,
                  color: str = 'rgba(252, 219, 3, 0.2)'):
         self._chart = series._chart
         super().__init__(self._chart.win)
-        start_time, end_time = pd.to_datetime(start_time), pd.to_datetime(end_time)
+        # The span is dropped by the chart's `retention` once this time falls off the left edge.
+        self._end = end_time if end_time is not None else max(start_time if isinstance(start_time, list) else [start_time])
         self.run_script(f'''
         {self.id} = {self._chart.id}.chart.addHistogramSeries({{
                 color: '{color}',
@@ -453,24 +762,24 @@ class VerticalSpan(Pane):
         {self.id}.priceScale('').applyOptions({{
             scaleMargins: {{top: 0, bottom: 0}}
         }})
-        ''')
+        ''', key=('create', self.id))
         if end_time is None:
-            if isinstance(start_time, pd.DatetimeIndex):
-                data = [{'time': time.timestamp(), 'value': 1} for time in start_time]
-            else:
-                data = [{'time': start_time.timestamp(), 'value': 1}]
-            self.run_script(f'{self.id}.setData({data})')
+            times = start_time if isinstance(start_time, list) else [start_time]
+            data = [{'time': time, 'value': 1} for time in times]
+            self.run_script(f'{self.id}.setData({data})', key=('span', self.id))
         else:
+            self.win.pin(series.id)
             self.run_script(f'''
             {self.id}.setData(calculateTrendLine(
-            {start_time.timestamp()}, 1, {end_time.timestamp()}, 1, {series.id}))
-            ''')
+            {start_time}, 1, {end_time}, 1, {series.id}))
+            ''', key=('span', self.id))
 
     def delete(self):
         """
         Irreversibly deletes the vertical span.
         """
-        self.run_script(f'{self._chart.id}.chart.removeSeries({self.id})')
+        self.run_script(f'{self._chart.id}.chart.removeSeries({self.id}); delete {self.id}', key=('delete', self.id))
+        self.win.registry.release(self.id)
 
 
 class Line(SeriesCommon):
@@ -494,28 +803,29 @@ class Line(SeriesCommon):
                         },
                     }),""" if chart._scale_candles_only else ''}
                 }}),
-            markers: [],
             horizontal_lines: [],
             name: '{name}',
             color: '{color}',
             precision: 2,
             }}
-        null''')
+        {self.id}.markers = new MarkerStore({self.id}.series, {chart.id}.chart)
+        null''', key=('create', self.id))
 
     def _set_trend(self, start_time, start_value, end_time, end_value, ray=False, round=False):
         if round:
             start_time = self._single_datetime_format(start_time)
             end_time = self._single_datetime_format(end_time)
         else:
-            start_time, end_time = pd.to_datetime((start_time, end_time)).astype('int64') // 10 ** 9
+            start_time, end_time = int(timecodec.to_seconds(start_time)), int(timecodec.to_seconds(end_time))
 
+        self.win.pin(self._chart.id)
         self.run_script(f'''
         {self._chart.id}.chart.timeScale().applyOptions({{shiftVisibleRangeOnNewBar: false}})
         {self.id}.series.setData(
             calculateTrendLine({start_time}, {start_value}, {end_time}, {end_value},
                                 {self._chart.id}, {jbool(ray)}))
         {self._chart.id}.chart.timeScale().applyOptions({{shiftVisibleRangeOnNewBar: true}})
-        ''')
+        ''', key=('trend', self.id))
 
     def delete(self):
         """
@@ -528,7 +838,8 @@ class Line(SeriesCommon):
                 if (line.line === {self.id}) {self._chart.id}.legend.div.removeChild(line.row)
             }})
             delete {self.id}
-        ''')
+        ''', key=('delete', self.id))
+        self.win.registry.release(self.id)
 
 
 class Histogram(SeriesCommon):
@@ -545,15 +856,15 @@ class Histogram(SeriesCommon):
                 priceScaleId: '{self.id}',
                 priceFormat: {{type: "volume"}},
             }}),
-            markers: [],
             horizontal_lines: [],
             name: '{name}',
             color: '{color}',
             precision: 2,
             }}
+        {self.id}.markers = new MarkerStore({self.id}.series, {chart.id}.chart)
         {self.id}.series.priceScale().applyOptions({{
             scaleMargins: {{top:{scale_margin_top}, bottom: {scale_margin_bottom}}}
-        }})''')
+        }})''', key=('create', self.id))
 
     def delete(self):
         """
@@ -565,13 +876,14 @@ class Histogram(SeriesCommon):
                 if (line.line === {self.id}) {self._chart.id}.legend.div.removeChild(line.row)
             }})
             delete {self.id}
-        ''')
+        ''', key=('delete', self.id))
+        self.win.registry.release(self.id)
 
     def scale(self, scale_margin_top: float = 0.0, scale_margin_bottom: float = 0.0):
         self.run_script(f'''
         {self.id}.series.priceScale().applyOptions({{
             scaleMargins: {{top: {scale_margin_top}, bottom: {scale_margin_bottom}}}
-        }})''')
+        }})''', key=('scale', self.id))
 
 
 class Candlestick(SeriesCommon):
@@ -581,43 +893,289 @@ class Candlestick(SeriesCommon):
         self._volume_down_color = 'rgba(200,127,130,0.8)'
 
         self.candle_data = pd.DataFrame()
+        # Datasets kept in the page: key -> (token, frame, cadence); see `load_dataset`.
+        self._datasets = {}
+        self._dataset_ids = count()
+        self._shown_dataset = None
+        self._load: Optional[ProgressiveLoad] = None
 
         self.run_script(f'{self.id}.makeCandlestickSeries()')
 
-    def set(self, df: pd.DataFrame = None, render_drawings=False):
+    def set(self, df: pd.DataFrame = None, render_drawings=False, interval: Union[NUM, str] = None,
+            cache_key=None, copy: bool = True):
         """
         Sets the initial data for the chart.\n
         :param df: columns: date/time, open, high, low, close, volume (if volume enabled).
         :param render_drawings: Re-renders any drawings made through the toolbox. Otherwise, they will be deleted.
-        """
+        :param interval: The bar interval in seconds (or a string such as '1h'). Skips interval detection.
+        :param cache_key: identifies `df` in the payload cache instead of its fingerprint.
+        :param copy: False hands `df` over to the chart, which formats it in place and keeps it as
+        `candle_data`; the frame must not be used afterwards. The page then keeps the data in the series
+        alone, without the `data` mirrors, and nothing is cached.
+        """
+        self._shown_dataset = None
+        self._cancel_load()
         if df is None or df.empty:
-            self.run_script(f'{self.id}.series.setData([])')
-            self.run_script(f'{self.id}.volumeSeries.setData([])')
+            self.run_script(f'{self.id}.series.setData([]); {self.id}.volumeSeries.setData([])', key=('data', self.id))
             self.candle_data = pd.DataFrame()
             return
-        df = self._df_datetime_format(df)
-        self.candle_data = df.copy()
+        if copy:
+            df, cadence, arguments = self._prepare(df, interval, cache_key)
+        else:
+            df, cadence = self._df_time_columns(df, interval=interval, copy=False)
+            with self.win.timer('serialization'):
+                arguments = self._dataset_arguments(df, mirror=False)
+        self._show(df, cadence, f'applyDataset({arguments})', render_drawings, copy=copy)
+
+    def _prepare(self, df: pd.DataFrame, interval=None, cache_key=None) -> tuple:
+        """
+        :return: the formatted frame, its cadence, and the `applyDataset` arguments setting the
+        candles, volume and every line drawn from a column of the frame.
+        """
+        # Frames prepared before are not formatted and serialized again; see `Window.payloads`.
+        cache = self.win.payloads
+        key = cache.key(
+            df, cache_key, self.id, interval, self._volume_up_color, self._volume_down_color,
+            *((line.id, line.name) for line in self._lines)
+        ) if cache is not None else None
+        entry = cache.get(key) if cache is not None else None
+        if entry is not None:
+            return entry
+        df, cadence = self._df_time_columns(df, interval=interval)
+        with self.win.timer('serialization'):
+            arguments = self._dataset_arguments(df)
+        if cache is not None:
+            cache.put(key, (df, cadence, arguments), payload_size(df, arguments))
+        return df, cadence, arguments
+
+    def _dataset_arguments(self, df: pd.DataFrame, mirror=True) -> str:
+        # The candles, volume and every line drawn from a column of `df` share the
+        # time axis, so they are serialized once and applied by a single call.
+        dataset = Dataset(df['time'])
+        self._add_to_dataset(dataset, df, mirror)
+        for line in self._data_lines(df):
+            line._add_to_dataset(dataset, self._line_frame(df, line), mirror)
+        return dataset.arguments()
+
+    def _data_lines(self, df: pd.DataFrame) -> list:
+        return [line for line in self._lines if line.name in df.columns]
+
+    @staticmethod
+    def _line_frame(df: pd.DataFrame, line: 'Line') -> pd.DataFrame:
+        return df[['time', line.name]].rename(columns={line.name: 'value'})
+
+    def _show(self, df: pd.DataFrame, cadence, script: str, render_drawings=False, load: int = None, copy=True):
+        """
+        Makes a prepared frame the data of the series and its lines, and runs the script showing it.\n
+        :param load: the id of the progressive load the frame starts; the chunks of any other are ignored.
+        :param copy: False keeps `df` itself, and drops the page's mirrors of the data.
+        """
+        self._use_cadence(cadence)
+        self.candle_data = df.copy() if copy else df
         self._last_bar = df.iloc[-1]
+        self._mirrored = copy
+        lines = self._data_lines(df)
+        for line in lines:
+            # The line's columns are taken out of `df`, so they need no copy of their own.
+            line._store(self._line_frame(df, line), copy=False)
+            line._mirrored = copy
+        unmirrored = '' if copy else '\n'.join(f'{series.id}.data = null' for series in (self, *lines))
 
-        self.run_script(f'{self.id}.data = {js_data(df)}; {self.id}.series.setData({self.id}.data)')
         toolbox_action = 'clearDrawings' if not render_drawings else 'renderDrawings'
-        self.run_script(f"if ('toolBox' in {self._chart.id}) {self._chart.id}.toolBox.{toolbox_action}()")
-        if 'volume' not in df:
-            return
-        volume = df.drop(columns=['open', 'high', 'low', 'close']).rename(columns={'volume': 'value'})
-        volume['color'] = self._volume_down_color
-        volume.loc[df['close'] > df['open'], 'color'] = self._volume_up_color
-        self.run_script(f'{self.id}.volumeSeries.setData({js_data(volume)})')
-
-        for line in self._lines:
-            if line.name not in df.columns:
-                continue
-            line.set(df[['time', line.name]], format_cols=False)
         # set autoScale to true in case the user has dragged the price scale
         self.run_script(f'''
+            {unmirrored}
+            {script}
+            {self.id}.loadToken = {load if load is not None else 'null'}
+            {self.id}.loadChunks = null
+            if ('toolBox' in {self._chart.id}) {self._chart.id}.toolBox.{toolbox_action}()
             if (!{self.id}.chart.priceScale("right").options.autoScale)
                 {self.id}.chart.priceScale("right").applyOptions({{autoScale: true}})
-        ''')
+        ''', key=('data', self.id, *(line.id for line in lines)))
+
+    def set_progressive(self, df: pd.DataFrame, chunk_size: int = 100_000, interval: Union[NUM, str] = None,
+                        render_drawings=False, on_progress: callable = None) -> ProgressiveLoad:
+        """
+        Sets the data in chunks, for histories of millions of bars. The most recent chunk is shown at once,
+        so the chart is usable straight away; the older chunks are then sent from a background thread,
+        each once the page has evaluated the one before, so only one chunk is serialized or in flight at
+        a time, and no script is larger than `chunk_size` rows.\n
+        The chunks received are merged ahead of the data shown whenever they add up to as many rows as it,
+        so the history appears in steps that double it, and each row is copied a few times on average.
+        Merging briefly needs about twice the memory of the data shown, in the page and in Python.\n
+        A later `set` or `show_dataset` cancels the load. Updates may be sent while it runs.
+        :param df: as in `set`.
+        :param on_progress: called with the rows loaded and the total rows after each chunk, in the loading thread.
+        :return: the load, to `cancel` (e.g. when the symbol changes) or `wait` for.
+        """
+        if df is None or len(df) <= chunk_size:
+            self.set(df, render_drawings, interval)
+            load = ProgressiveLoad(0 if df is None else len(df), on_progress)
+            load._advance(load.total)
+            load._finish()
+            return load
+        self._shown_dataset = None
+        self._cancel_load()
+        self._load = load = ProgressiveLoad(len(df), on_progress)
+        start = len(df) - chunk_size
+        recent, cadence = self._df_time_columns(df.iloc[start:], interval=interval)
+        with self.win.timer('serialization'):
+            arguments = self._dataset_arguments(recent)
+        self._show(recent, cadence, f'applyDataset({arguments})', render_drawings, load=load.id)
+        load._advance(len(recent))
+        load._start(self._load_older, df, start, chunk_size, load)
+        return load
+
+    def _load_older(self, df: pd.DataFrame, stop: int, chunk_size: int, load: ProgressiveLoad):
+        chunks, queued, shown = [], 0, len(df) - stop
+        try:
+            while stop > 0 and not load.cancelled:
+                start = max(stop - chunk_size, 0)
+                chunk, _ = self._df_time_columns(df.iloc[start:stop])
+                with self.win.timer('serialization'):
+                    arguments = self._dataset_arguments(chunk)
+                if load.cancelled:
+                    break
+                chunks.append(chunk)
+                queued += len(chunk)
+                # The chunks are merged, here and in the page, once they are as many rows as the data shown,
+                # so merging takes time linear in the rows loaded rather than quadratic.
+                merge = start == 0 or queued >= shown
+                self.run_script(
+                    f'prependDataset({self.id}, {load.id}, {arguments}, {jbool(merge)})', key=('update', self.id)
+                )
+                if merge:
+                    self._merge_older(chunks, load)
+                    chunks, queued, shown = [], 0, shown + queued
+                self._wait_for_page()
+                load._advance(len(chunk))
+                stop = start
+        finally:
+            # A cancelled load keeps the chunks the page has received.
+            if chunks and self._load is load:
+                self.run_script(f'mergeChunks({self.id}, {load.id})', key=('update', self.id))
+                self._merge_older(chunks, load)
+
+    def _merge_older(self, chunks: list, load: ProgressiveLoad):
+        older = pd.concat(chunks[::-1], ignore_index=True)
+        # The lock keeps updates and trims from the caller's thread out of the merge.
+        with self.win._data_lock:
+            if self._load is load:
+                self.candle_data = pd.concat([older, self.candle_data], ignore_index=True)
+                for line in self._data_lines(older):
+                    line.data = pd.concat([self._line_frame(older, line), line.data], ignore_index=True)
+
+    def _wait_for_page(self):
+        if not self.win.loaded or self.win.transport is None:
+            return
+        try:
+            self.win.evaluate('0')
+        except ConnectionError:
+            pass
+
+    def _cancel_load(self):
+        # Once cancelled, a load no longer merges its chunks into the data being replaced.
+        with self.win._data_lock:
+            if self._load is not None:
+                self._load.cancel()
+                self._load = None
+
+    def load_dataset(self, key, df: pd.DataFrame, interval: Union[NUM, str] = None, cache_key=None):
+        """
+        Keeps a dataset in the page's memory, so `show_dataset` can switch to it without sending it again;
+        e.g. for the symbols and timeframes recently viewed. The data shown is left unchanged.\n
+        The page keeps up to `Window.dataset_budget` bytes of serialized data, evicting the datasets
+        shown least recently first; evicted datasets have to be loaded again.
+        :param key: any hashable, e.g. (symbol, timeframe).
+        :param df: as in `set`.
+        """
+        if df is None or df.empty:
+            raise ValueError('Cannot load an empty dataset.')
+        df, cadence, arguments = self._prepare(df, interval, cache_key)
+        if self._datasets_handler not in self.win.handlers:
+            self.win.registry.add_handler(self.id, self._datasets_handler, self._on_datasets)
+        previous = self._datasets.get(key)
+        token = next(self._dataset_ids)
+        self._datasets[key] = (token, df, cadence)
+        # A new token per load, so an eviction reported for the previous one is told apart.
+        self.run_script(f'''
+            {f'dropDataset({self.id}, {previous[0]})' if previous else ''}
+            storeDataset({self.id}, {token}, {len(arguments)}, {self.win.dataset_budget}, {arguments})
+        ''', key=('dataset', self.id, token), record=False)
+
+    def show_dataset(self, key, render_drawings=False):
+        """
+        Sets the data of the chart to a dataset kept by `load_dataset`.\n
+        :raises KeyError: if the dataset was not loaded, or has been evicted.
+        """
+        token, df, cadence = self._datasets[key]
+        self._shown_dataset = token
+        self._cancel_load()
+        self._show(df, cadence, f'showDataset({self.id}, {token})', render_drawings)
+
+    def datasets(self) -> list:
+        """
+        :return: the keys of the datasets kept in the page.
+        """
+        return list(self._datasets)
+
+    @property
+    def _datasets_handler(self) -> str:
+        return f'__datasets__{self.id}'
+
+    def _on_datasets(self, kind: str, *tokens: str):
+        tokens = {int(token) for token in tokens}
+        for key, (token, _, _) in list(self._datasets.items()):
+            if token in tokens:
+                del self._datasets[key]
+        # The page evicted the dataset before the eviction reached Python; the data is sent instead.
+        if kind == 'missing' and self._shown_dataset in tokens:
+            self._shown_dataset = None
+            self.run_script(
+                '\n'.join(series._data_script() for series in (self, *self._data_lines(self.candle_data))),
+                key=('data', self.id, *(line.id for line in self._data_lines(self.candle_data)))
+            )
+
+    def _restored(self):
+        super()._restored()
+        self._datasets, self._dataset_ids, self._shown_dataset = {}, count(), None
+        self._load = None
+
+    def _add_to_dataset(self, dataset: Dataset, df: pd.DataFrame, mirror=True):
+        line_names = (line.name for line in self._lines if line.name in df.columns)
+        excluded = {'time', 'volume', *line_names} - {'open', 'high', 'low', 'close'}
+        dataset.add(
+            f'{self.id}.series', {col: df[col] for col in df.columns if col not in excluded},
+            mirror=self.id if mirror else None
+        )
+        if 'volume' in df:
+            dataset.add(f'{self.id}.volumeSeries', {'value': df['volume']}, palettes={
+                'color': ((self._volume_down_color, self._volume_up_color), (df['close'] > df['open']).astype('int8'))
+            })
+
+    def _stored_data(self) -> pd.DataFrame:
+        return self.candle_data
+
+    def _store_data(self, df: pd.DataFrame):
+        self.candle_data = df
+
+    def _trim_rows(self, cutoff: float):
+        self.candle_data = self.candle_data[self.candle_data['time'] >= cutoff].reset_index(drop=True)
+
+    def _trim(self, cutoff: float):
+        super()._trim(cutoff)
+        for pane in self.win.registry.panes():
+            if pane is self or getattr(pane, '_chart', None) is not self:
+                continue
+            if isinstance(pane, SeriesCommon):
+                pane._trim(cutoff)
+            elif isinstance(pane, VerticalSpan) and pane._end < cutoff:
+                pane.delete()
+
+    def _data_script(self, data: pd.DataFrame = None) -> str:
+        if self.candle_data.empty:
+            return f'{self.id}.series.setData([]); {self.id}.volumeSeries.setData([])'
+        return super()._data_script(self.candle_data)
 
     def update(self, series: pd.Series, render_drawings=False, _from_tick=False):
         """
@@ -626,27 +1184,39 @@ class Candlestick(SeriesCommon):
         :param series: labels: date/time, open, high, low, close, volume (if using volume).
         """
         series = self._series_datetime_format(series) if not _from_tick else series
-        if series['time'] != self._last_bar['time']:
-            self.candle_data.loc[self.candle_data.index[-1]] = self._last_bar
-            self.candle_data = pd.concat([self.candle_data, series.to_frame().T], ignore_index=True)
-            self._chart.events.new_bar._emit(self)
-        self._last_bar = series
-        bar = js_data(series)
-        self.run_script(f'''
-            if (stampToDate(lastBar({self.id}.data).time).getTime() === stampToDate({series['time']}).getTime()) {{
-                {self.id}.data[{self.id}.data.length-1] = {bar}
-            }}
-            else {{
-                {self.id}.data.push({bar})
-                {f'{self.id}.toolBox.renderDrawings()' if render_drawings else ''}
-            }}
+        new_bar = series['time'] != self._last_bar['time']
+        with self.win._data_lock:
+            if new_bar:
+                self.candle_data.loc[self.candle_data.index[-1]] = self._last_bar
+                self.candle_data = pd.concat([self.candle_data, series.to_frame().T], ignore_index=True)
+                self._chart.events.new_bar._emit(self)
+            self._last_bar = series
+            if new_bar:
+                self._retain()
+        with self.win.timer('serialization'):
+            bar = js_data(series)
+        self.win.pin(self.id)
+        if not self._mirrored:
+            self.run_script(f'''
             {self.id}.series.update({bar})
-        ''')
+            {f'{self.id}.toolBox.renderDrawings()' if render_drawings and new_bar else ''}
+            ''', key=('update', self.id))
+        else:
+            self.run_script(f'''
+                if (stampToDate(lastBar({self.id}.data).time).getTime() === stampToDate({series['time']}).getTime()) {{
+                    {self.id}.data[{self.id}.data.length-1] = {bar}
+                }}
+                else {{
+                    {self.id}.data.push({bar})
+                    {f'{self.id}.toolBox.renderDrawings()' if render_drawings else ''}
+                }}
+                {self.id}.series.update({bar})
+            ''', key=('update', self.id))
         if 'volume' not in series:
             return
         volume = series.drop(['open', 'high', 'low', 'close']).rename({'volume': 'value'})
         volume['color'] = self._volume_up_color if series['close'] > series['open'] else self._volume_down_color
-        self.run_script(f'{self.id}.volumeSeries.update({js_data(volume)})')
+        self.run_script(f'{self.id}.volumeSeries.update({js_data(volume)})', key=('update', self.id))
 
     def update_from_tick(self, series: pd.Series, cumulative_volume: bool = False):
         """
@@ -679,6 +1249,100 @@ class Candlestick(SeriesCommon):
                 bar['volume'] = series['volume']
         self.update(bar, _from_tick=True)
 
+    def update_from_ticks(self, ticks: Union[pd.DataFrame, dict], cumulative_volume: bool = False):
+        """
+        Updates the data from many ticks at once, e.g. a backlog caught up after a reconnect. The ticks
+        are bucketed into bars in one pass, and the bars sent in a single script; the result is the same
+        as calling `update_from_tick` for each tick, except that `new_bar` is emitted once.\n
+        :param ticks: a DataFrame, or a dict of arrays, with date/time, price and volume (if using volume), in time order.
+        :param cumulative_volume: Adds the volume of every tick onto its bar.
+        """
+        if not isinstance(ticks, pd.DataFrame):
+            ticks = pd.DataFrame(ticks)
+        if ticks.empty:
+            return
+        columns = {label.lower() if isinstance(label, str) else label: label for label in ticks.columns}
+        bar_times = timecodec.floor_array(self._tick_seconds(ticks), self._interval, self.offset)
+        price = np.asarray(ticks[columns['price']], dtype='float64')
+        volume = np.asarray(ticks[columns['volume']], dtype='float64') if 'volume' in columns else None
+
+        if self._last_bar is None:
+            raise TypeError('Ticks added before data was set.')
+        if (np.diff(bar_times) < 0).any():
+            raise ValueError('Ticks must be in time order.')
+        last = self._last_bar
+        if bar_times[0] < last['time']:
+            raise ValueError(
+                f'Trying to update tick of time "{pd.to_datetime(bar_times[0], unit="s")}", '
+                f'which occurs before the last bar time of '
+                f'"{pd.to_datetime(last["time"], unit="s")}".')
+
+        starts = np.flatnonzero(np.concatenate(([True], bar_times[1:] != bar_times[:-1])))
+        ends = np.concatenate((starts[1:], [len(price)])) - 1
+        bars = pd.DataFrame({
+            'time': bar_times[starts],
+            'open': price[starts],
+            'high': np.maximum.reduceat(price, starts),
+            'low': np.minimum.reduceat(price, starts),
+            'close': price[ends],
+        })
+        if volume is not None:
+            bars['volume'] = np.add.reduceat(volume, starts) if cumulative_volume else volume[ends]
+
+        # The first bucket continues the last bar when it falls within it.
+        merged = bars['time'].iat[0] == last['time']
+        if merged:
+            bars.loc[0, 'open'] = last['open']
+            bars.loc[0, 'high'] = max(last['high'], bars['high'].iat[0])
+            bars.loc[0, 'low'] = min(last['low'], bars['low'].iat[0])
+            if volume is not None and cumulative_volume and 'volume' in last:
+                bars.loc[0, 'volume'] += last['volume']
+        self._update_bars(bars)
+
+    @staticmethod
+    def _tick_seconds(ticks: pd.DataFrame):
+        """
+        :return: the epoch seconds of the date/time column of `ticks`, or of its index.
+        """
+        columns = {label.lower() if isinstance(label, str) else label: label for label in ticks.columns}
+        label = columns.get('time', columns.get('date'))
+        return timecodec.to_seconds_array(ticks[label] if label is not None else ticks.index)
+
+    def _update_bars(self, bars: pd.DataFrame):
+        """
+        Adds formatted bars in time order, with the chart's lines drawn from their columns, in one script.
+        The first bar replaces the last one if it has the same time.
+        """
+        new_bars = self._append_bars(bars)
+        lines = self._data_lines(bars)
+        dataset = Dataset(bars['time'])
+        self._add_to_dataset(dataset, bars, mirror=self._mirrored)
+        for line in lines:
+            line_df = self._line_frame(bars, line)
+            line._append_bars(line_df)
+            line._add_to_dataset(dataset, line_df, mirror=line._mirrored)
+        with self.win.timer('serialization'):
+            script = f'updateDataset({dataset.arguments()})'
+        self.win.pin(self.id)
+        self.run_script(script, key=('update', self.id))
+        if new_bars:
+            self._chart.events.new_bar._emit(self)
+            self._retain()
+
+    def replay(self, source: pd.DataFrame, ticks: bool = False, speed: float = 1.0, start: TIME = None,
+               fps: int = 30, markers: list = None, cumulative_volume: bool = False,
+               on_frame: callable = None) -> Replay:
+        """
+        Plays historical bars (as in `set`) or ticks (as in `update_from_ticks`) into the chart at
+        `speed` times real time, to be paused, sped up, stepped and seeked; see `Replay`.\n
+        :param start: the time to play from; the rows before it are shown at once. Defaults to the
+        second bar, or to the first tick; ticks continue the data the chart has when the replay starts.
+        :param fps: the number of batches sent per second, at most.
+        :param markers: markers, as in `marker_list`, shown once their time is reached.
+        :param on_frame: called with the chart and the time of the last row played, after each batch.
+        """
+        return Replay(self, source, ticks, speed, start, fps, markers, cumulative_volume, on_frame)
+
     def price_scale(
         self, auto_scale: bool = True, mode: PRICE_SCALE_MODE = 'normal', invert_scale: bool = False,
             align_labels: bool = True, scale_margin_top: float = 0.2, scale_margin_bottom: float = 0.2,
@@ -699,7 +1363,7 @@ class Candlestick(SeriesCommon):
                 visible: {jbool(visible)},
                 ticksVisible: {jbool(ticks_visible)},
                 minimumWidth: {minimum_width}
-            }})''')
+            }})''', key=(f'price_scale:{bool(border_color)}{bool(text_color)}', self.id))
 
     def candle_style(
             self, up_color: str = 'rgba(39, 157, 130, 100)', down_color: str = 'rgba(200, 97, 100, 100)',
@@ -725,7 +1389,7 @@ class Candlestick(SeriesCommon):
             {f'borderDownColor: "{border_down_color}",' if border_enabled else ''}
             {f'wickUpColor: "{wick_up_color}",' if wick_enabled else ''}
             {f'wickDownColor: "{wick_down_color}",' if wick_enabled else ''}
-        }})""")
+        }})""", key=(f'candle_style:{border_enabled}{wick_enabled}', self.id))
 
     def volume_config(self, scale_margin_top: float = 0.8, scale_margin_bottom: float = 0.0,
                       up_color='rgba(83,141,131,0.8)', down_color='rgba(200,127,130,0.8)'):
@@ -742,7 +1406,7 @@ class Candlestick(SeriesCommon):
             top: {scale_margin_top},
             bottom: {scale_margin_bottom},
             }}
-        }})''')
+        }})''', key=('volume_config', self.id))
 
 
 class AbstractChart(Candlestick, Pane):
@@ -766,12 +1430,17 @@ class AbstractChart(Candlestick, Pane):
 
         self.topbar: TopBar = TopBar(self)
 
+    def _restored(self):
+        super()._restored()
+        # Event callbacks are not saved in snapshots; they are subscribed again through `events`.
+        self.events = Events(self)
 
     def fit(self):
         """
         Fits the maximum amount of the chart data within the viewport.
         """
-        self.run_script(f'{self.id}.chart.timeScale().fitContent()')
+        self.win.pin(self.id)
+        self.run_script(f'{self.id}.chart.timeScale().fitContent()', key=('fit', self.id))
 
     def create_line(
             self, name: str = '', color: str = 'rgba(214, 237, 255, 0.6)',
@@ -822,12 +1491,13 @@ class AbstractChart(Candlestick, Pane):
         return line
 
     def set_visible_range(self, start_time: TIME, end_time: TIME):
+        self.win.pin(self.id)
         self.run_script(f'''
         {self.id}.chart.timeScale().setVisibleRange({{
-            from: {pd.to_datetime(start_time).timestamp()},
-            to: {pd.to_datetime(end_time).timestamp()}
+            from: {timecodec.to_seconds(start_time)},
+            to: {timecodec.to_seconds(end_time)}
         }})
-        ''')
+        ''', key=('visible_range', self.id))
 
     def resize(self, width: float = None, height: float = None):
         """
@@ -840,7 +1510,7 @@ class AbstractChart(Candlestick, Pane):
         {self.id}.scale.width = {self._width}
         {self.id}.scale.height = {self._height}
         {self.id}.reSize()
-        ''')
+        ''', key=('resize', self.id))
 
     def time_scale(self, right_offset: int = 0, min_bar_spacing: float = 0.5,
                    visible: bool = True, time_visible: bool = True, seconds_visible: bool = False,
@@ -859,7 +1529,7 @@ class AbstractChart(Candlestick, Pane):
                        borderVisible: {jbool(border_visible)},
                        {f'borderColor: "{border_color}",' if border_color else ''}
                    }}
-               }})''')
+               }})''', key=(f'time_scale:{bool(border_color)}', self.id))
 
     def layout(self, background_color: str = '#000000', text_color: str = None,
                font_size: int = None, font_family: str = None):
@@ -874,7 +1544,7 @@ class AbstractChart(Candlestick, Pane):
             {f'textColor: "{text_color}",' if text_color else ''}
             {f'fontSize: {font_size},' if font_size else ''}
             {f'fontFamily: "{font_family}",' if font_family else ''}
-        }}}})""")
+        }}}})""", key=(f'layout:{bool(text_color)}{bool(font_size)}{bool(font_family)}', self.id))
 
     def grid(self, vert_enabled: bool = True, horz_enabled: bool = True,
              color: str = 'rgba(29, 30, 38, 5)', style: LINE_STYLE = 'solid'):
@@ -895,7 +1565,7 @@ class AbstractChart(Candlestick, Pane):
                    style: {line_style(style)},
                }},
            }}
-           }})""")
+           }})""", key=('grid', self.id))
 
     def crosshair(self, mode: CROSSHAIR_MODE = 'normal', vert_visible: bool = True,
                   vert_width: int = 1, vert_color: str = None, vert_style: LINE_STYLE = 'large_dashed',
@@ -923,7 +1593,7 @@ class AbstractChart(Candlestick, Pane):
                     style: {line_style(horz_style)},
                     labelBackgroundColor: "{horz_label_background_color}"
                 }}
-            }}}})''')
+            }}}})''', key=(f'crosshair:{bool(vert_color)}{bool(horz_color)}', self.id))
 
     def watermark(self, text: str, font_size: int = 44, color: str = 'rgba(180, 180, 200, 0.5)'):
         """
@@ -939,7 +1609,7 @@ class AbstractChart(Candlestick, Pane):
                   color: '{color}',
                   text: '{text}',
               }}
-          }})''')
+          }})''', key=('watermark', self.id))
 
     def legend(self, visible: bool = False, ohlc: bool = True, percent: bool = True, lines: bool = True,
                color: str = 'rgb(191, 195, 203)', font_size: int = 11, font_family: str = 'Monaco',
@@ -954,7 +1624,7 @@ class AbstractChart(Candlestick, Pane):
             {l_id}.ohlcEnabled = false
             {l_id}.percentEnabled = false
             {l_id}.linesEnabled = false
-            ''')
+            ''', key=('legend', self.id))
             return
         self.run_script(f'''
         {l_id}.div.style.display = 'flex'
@@ -967,10 +1637,10 @@ class AbstractChart(Candlestick, Pane):
         {l_id}.div.style.fontSize = '{font_size}px'
         {l_id}.div.style.fontFamily = '{font_family}'
         {l_id}.text.innerText = '{text}'
-        ''')
+        ''', key=('legend', self.id))
 
     def spinner(self, visible):
-        self.run_script(f"{self.id}.spinner.style.display = '{'block' if visible else 'none'}'")
+        self.run_script(f"{self.id}.spinner.style.display = '{'block' if visible else 'none'}'", key=('spinner', self.id))
 
     def hotkey(self, modifier_key: Literal['ctrl', 'alt', 'shift', 'meta', None],
                keys: Union[str, tuple, int], func: callable):
@@ -995,19 +1665,34 @@ class AbstractChart(Candlestick, Pane):
                         }}
                         else return false
                     }})''')
-        self.win.handlers[f'{modifier_key, keys}'] = func
+        self.win.registry.add_handler(self.id, f'{modifier_key, keys}', func)
 
 
 
+    def snapshot(self, path: str) -> str:
+        """
+        Saves the state of the chart and of every pane in its window (series data, lines, histograms,
+        markers, horizontal lines, spans, topbar widgets and styling) to a compressed binary file.\n
+        Rebuild it with `Chart.restore`. Callbacks are not saved.
+        :return: the path written.
+        """
+        from .snapshot import save
+        return save(self, path)
+
     def screenshot(self) -> bytes:
         """
         Takes a screenshot. This method can only be used after the chart window is visible.
         :return: a bytes object containing a screenshot of the chart.
         """
-        self.run_script(f'_~_~RETURN~_~_{self.id}.chart.takeScreenshot().toDataURL()')
-        serial_data = self.win._return_q.get()
+        serial_data = self.win.evaluate(f'{self.id}.chart.takeScreenshot().toDataURL()')
         return b64decode(serial_data.split(',')[1])
 
+    def stats(self, format: Literal['dict', 'prometheus'] = 'dict'):
+        """
+        The runtime statistics of the chart's window; see `Window.stats`.
+        """
+        return self.win.stats(format)
+
     def create_subchart(self, position: FLOAT = 'left', width: float = 0.5, height: float = 0.5,
                         sync: Union[str, bool] = None, scale_candles_only: bool = False,
                         sync_crosshairs_only: bool = False,
@@ -0,0 +1,85 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+
+def fingerprint(df: pd.DataFrame, rows: int = 16) -> tuple:
+    """
+    A cheap identity for a frame: its shape, columns and dtypes, and a hash of its first and last
+    rows plus rows sampled evenly in between. Frames differing only in unsampled rows collide;
+    pass an explicit `cache_key` to `set` where that matters.
+    """
+    n = len(df)
+    positions = np.unique(np.concatenate((
+        np.arange(min(rows, n)), np.arange(max(n - rows, 0), n), np.linspace(0, n - 1, rows, dtype=np.int64),
+    ))) if n else np.arange(0)
+    sample = df.iloc[positions]
+    return (
+        df.shape, tuple(map(str, df.columns)), tuple(map(str, df.dtypes)),
+        int(pd.util.hash_pandas_object(sample, index=True).sum()),
+    )
+
+
+class PayloadCache:
+    """
+    Prepared `set` payloads (the formatted frame, its cadence and the serialized script), keyed by
+    the fingerprint of the input frame and the state of the series it was prepared for.\n
+    Entries are evicted least recently used first once `max_bytes` is exceeded.
+    """
+    def __init__(self, max_bytes: int = 64 * 2 ** 20):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = self.misses = self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(data, cache_key=None, *parts) -> tuple:
+        """
+        :param cache_key: identifies the data instead of its fingerprint, e.g. (symbol, timeframe, last update).
+        """
+        return (fingerprint(data) if cache_key is None else ('key', cache_key), *parts)
+
+    def get(self, key: tuple):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key: tuple, value, size: int):
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= previous[1]
+            self._entries[key] = (value, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.bytes -= evicted
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        return {
+            'entries': len(self._entries), 'bytes': self.bytes, 'max_bytes': self.max_bytes,
+            'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+        }
+
+
+def payload_size(df: pd.DataFrame, script: str) -> int:
+    return int(df.memory_usage(index=True).sum()) + len(script)
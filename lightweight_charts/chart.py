@@ -1,103 +1,78 @@
 import asyncio
-import multiprocessing as mp
-import webview
 
-from lightweight_charts import abstract
+from lightweight_charts import abstract, snapshot, tracing
+from .dispatch import Dispatcher
+from .transport import Transport, PyWebviewTransport
 from .util import parse_event_message, FLOAT
 
 
-class CallbackAPI:
-    def __init__(self, emit_queue):
-        self.emit_q = emit_queue
-
-    def callback(self, message: str):
-        self.emit_q.put(message)
-
-
-class PyWV:
-    def __init__(self, q, start_ev, exit_ev, loaded, emit_queue, return_queue, html, debug,
-                 width, height, x, y, screen, on_top, maximize, title):
-        self.queue = q
-        self.return_queue = return_queue
-        self.exit = exit_ev
-        self.callback_api = CallbackAPI(emit_queue)
-        self.loaded: list = loaded
-        self.html = html
-
-        self.windows = []
-        self.create_window(width, height, x, y, screen, on_top, maximize, title)
-
-        start_ev.wait()
-        # 优化：减少webview启动延迟
-        webview.start(debug=debug, http_server=True)
-        self.exit.set()
-
-    def create_window(self, width, height, x, y, screen=None, on_top=False, maximize=False, title=''):
-        screen = webview.screens[screen] if screen is not None else None
-        if maximize:
-            if screen is None:
-                active_screen = webview.screens[0]
-                width, height = active_screen.width, active_screen.height
-            else:
-                width, height = screen.width, screen.height
-        self.windows.append(webview.create_window(
-            title, html=self.html, js_api=self.callback_api,
-            width=width, height=height, x=x, y=y, screen=screen,
-            on_top=on_top,  background_color='#000000'))
-        self.windows[-1].events.loaded += lambda: self.loop(self.loaded[len(self.windows)-1])
-
-    def loop(self, loaded):
-        loaded.set()
-        while 1:
-            i, arg = self.queue.get()
-            if i == 'create_window':
-                self.create_window(*arg)
-            elif arg in ('show', 'hide'):
-                getattr(self.windows[i], arg)()
-            elif arg == 'exit':
-                self.exit.set()
-            else:
-                try:
-                    if '_~_~RETURN~_~_' in arg:
-                        self.return_queue.put(self.windows[i].evaluate_js(arg[14:]))
-                    else:
-                        self.windows[i].evaluate_js(arg)
-                except KeyError:
-                    return
-
-
 class Chart(abstract.AbstractChart):
-    MAX_WINDOWS = 10
-    _window_num = 0
     _main_window_handlers = None
-    _exit, _start = (mp.Event() for _ in range(2))
-    _q, _emit_q, _return_q = (mp.Queue() for _ in range(3))
-    _loaded_list = [mp.Event() for _ in range(MAX_WINDOWS)]
+    _tracer = None
+    # Seconds `show_async` waits before polling an idle transport for events again.
+    poll_interval = 0.05
 
     def __init__(self, width: int = 800, height: int = 600, x: int = None, y: int = None, title: str = '',
                  screen: int = None, on_top: bool = False, maximize: bool = False, debug: bool = False,
                  toolbox: bool = False, inner_width: float = 1.0, inner_height: float = 1.0,
-                 scale_candles_only: bool = False, position: FLOAT = 'left'):
-        self._i = Chart._window_num
-        self._loaded = Chart._loaded_list[self._i]
-        abstract.Window._return_q = Chart._return_q
-        Chart._window_num += 1
+                 scale_candles_only: bool = False, position: FLOAT = 'left', trace: bool = False,
+                 headless: bool = False, transport: Transport = None):
+        """
+        :param trace: records the latency of every script, from `run_script` to the frame that draws it.
+        Query it with `latency()`.
+        :param headless: runs an in-process stub instead of the webview process; scripts are queued
+        and acknowledged but not rendered. Only the first chart of a session decides this.
+        :param transport: renders the chart through another transport, such as
+        `HeadlessTransport` or `WebSocketTransport`. The window options then do not apply.
+        """
+        window = self._open(width, height, x, y, title, screen, on_top, maximize, debug, trace, headless, transport)
+        super().__init__(window, inner_width, inner_height, scale_candles_only, toolbox, position=position)
+
+    def _open(self, width: int = 800, height: int = 600, x: int = None, y: int = None, title: str = '',
+              screen: int = None, on_top: bool = False, maximize: bool = False, debug: bool = False,
+              trace: bool = False, headless: bool = False, transport: Transport = None) -> abstract.Window:
+        self._transport = transport or PyWebviewTransport(
+            width, height, x, y, title, screen, on_top, maximize, debug, stub=headless)
         self.is_alive = True
+        self.dispatcher = Dispatcher()
+
+        window = abstract.Window(transport=self._transport, handlers=Chart._main_window_handlers)
+        Chart._main_window_handlers = window.handlers
+        if trace:
+            if not self._transport.supports_tracing:
+                raise ValueError(f'{type(self._transport).__name__} does not support tracing.')
+            Chart._tracer = Chart._tracer or tracing.Tracer()
+            window.tracer = Chart._tracer
+            window.handlers[tracing.HANDLER] = Chart._tracer.on_stamps
+        return window
+
+    @classmethod
+    def restore(cls, path: str, **kwargs) -> 'Chart':
+        """
+        Rebuilds a chart saved with `snapshot`, with its subcharts, series and widgets.\n
+        The page state is sent as a single script when the chart is shown. Callbacks are not
+        saved: set `func` on restored widgets and horizontal lines, and subscribe to `events` again.
+        Subcharts, histograms and the other panes are kept by id in `chart.win.restored`.
+        :param kwargs: the window options of `Chart` (width, height, title, headless, transport...).
+        """
+        chart = cls.__new__(cls)
+        return snapshot.load(path, chart._open(**kwargs), root=chart)
 
-        window = abstract.Window(lambda s: self._q.put((self._i, s)), 'pywebview.api.callback')
-        if self._i == 0:
-            super().__init__(window, inner_width, inner_height, scale_candles_only, toolbox, position=position)
-            Chart._main_window_handlers = self.win.handlers
-            self._process = mp.Process(target=PyWV, args=(
-                self._q, self._start, self._exit, Chart._loaded_list,
-                self._emit_q, self._return_q, abstract.TEMPLATE, debug,
-                width, height, x, y, screen, on_top, maximize, title
-            ), daemon=True)
-            self._process.start()
-        else:
-            window.handlers = Chart._main_window_handlers
-            super().__init__(window, inner_width, inner_height, scale_candles_only, toolbox, position=position)
-            self._q.put(('create_window', (width, height, x, y, screen, on_top, maximize, title)))
+    @staticmethod
+    def start(headless: bool = False, debug: bool = False):
+        """
+        Starts the webview process and keeps it resident: `exit` then only closes the chart's window,
+        and the next `Chart` opens in it without waiting for a new process and webview to start.\n
+        :param headless: starts the in-process stub instead; see `Chart(headless=True)`.
+        """
+        PyWebviewTransport.start(debug=debug, stub=headless)
+
+    @staticmethod
+    def stop():
+        """
+        Terminates the webview process started by `start`, closing every chart window.
+        """
+        PyWebviewTransport.stop()
 
     def show(self, block: bool = False):
         """
@@ -105,15 +80,14 @@ class Chart(abstract.AbstractChart):
         :param block: blocks execution until the chart is closed.
         """
         if not self.win.loaded:
-            self._start.set()
             # 优化：减少等待时间，使用超时机制
-            if self._loaded.wait(timeout=10):  # 最多等待10秒
+            if self._transport.load(timeout=10):  # 最多等待10秒
                 self.win.on_js_load()
             else:
                 print("警告：图表加载超时，但仍会尝试显示")
                 self.win.on_js_load()
         else:
-            self._q.put((self._i, 'show'))
+            self._transport.show()
         if block:
             asyncio.run(self.show_async(block=True))
 
@@ -122,39 +96,128 @@ class Chart(abstract.AbstractChart):
         if not block:
             asyncio.create_task(self.show_async(block=True))
             return
+        self._wake = asyncio.Event()
         try:
 
             while 1:
-                while self._emit_q.empty() and not self._exit.is_set():
-                    await asyncio.sleep(0.05)
-                if self._exit.is_set():
-                    self._exit.clear()
+                if self._transport.closed():
                     self.is_alive = False
                     self.exit()
                     return
-                elif not self._emit_q.empty():
-                    func, args = parse_event_message(self.win, self._emit_q.get())
-                    await func(*args) if asyncio.iscoroutinefunction(func) else func(*args)
+                message = self._transport.next_event()
+                if message is None:
+                    try:
+                        await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+                    except asyncio.TimeoutError:
+                        pass
+                    self._wake.clear()
                     continue
+                func, args = parse_event_message(self.win, message)
+                await self.dispatcher.dispatch(message.split('_~_', 1)[0], func, args, self.win.metrics)
         except KeyboardInterrupt:
             return
 
+    def latency(self) -> dict:
+        """
+        The latency of traced scripts, per stage: queue (run_script to the webview process),
+        evaluate (evaluate_js), render (to the next animation frame) and total.\n
+        :return: stage -> {count, p50, p99, max}, in seconds; None if tracing is off.
+        """
+        return self.win.tracer.summary() if self.win.tracer else None
+
     def hide(self):
         """
         Hides the chart window.\n
         """
-        self._q.put((self._i, 'hide'))
+        self._transport.hide()
 
     def exit(self):
         """
         Exits and destroys the chart window.\n
+        After `Chart.start`, the webview process keeps running for the next chart.
         """
-        self._q.put((self._i, 'exit'))
-        self._exit.wait() if self.win.loaded else None
-        self._process.terminate()
+        self._transport.close()
+        self.dispatcher.shutdown()
 
         Chart._main_window_handlers = None
-        Chart._window_num = 0
-        Chart._q = mp.Queue()
-        Chart._exit.clear(), Chart._start.clear()
+        Chart._tracer = None
         self.is_alive = False
+
+
+class AsyncChart:
+    """
+    An awaitable facade over a chart: `set`, `update`, `update_from_tick` and `flush` return once
+    the page has evaluated the scripts queued so far, so a producer goes no faster than the page.
+    Acknowledgements are dispatched by `show_async`, which must be running. Every other attribute
+    is the chart's.\n
+        chart = AsyncChart(Chart())
+        await chart.show_async()
+        await chart.set(df)
+        for bar in bars:
+            await chart.update(bar)
+    """
+    # The event poll interval while acknowledgements are awaited.
+    POLL_INTERVAL = 0.001
+
+    def __init__(self, chart: abstract.AbstractChart):
+        self.chart = chart
+        self._name = f'__ack__{chart.id}'
+        self._seq = 0
+        self._pending = {}
+        chart.win.registry.add_handler(chart.id, self._name, self._on_ack)
+
+    def __getattr__(self, name):
+        return getattr(self.chart, name)
+
+    def _on_ack(self, seq):
+        # Scripts are evaluated in order, so an acknowledgement confirms every earlier one too.
+        seq = int(seq)
+        while self._pending and next(iter(self._pending)) <= seq:
+            future = self._pending.pop(next(iter(self._pending)))
+            if not future.done():
+                future.get_loop().call_soon_threadsafe(future.set_result, None)
+        if not self._pending:
+            self.chart.__dict__.pop('poll_interval', None)
+
+    def _acknowledgement(self) -> asyncio.Future:
+        self._seq += 1
+        future = asyncio.get_running_loop().create_future()
+        self._pending[self._seq] = future
+        self.chart.poll_interval = self.POLL_INTERVAL
+        # A later acknowledgement may supersede this one; it resolves the earlier futures too.
+        self.chart.win.run_script(
+            f'acknowledge("{self._name}", {self._seq})', key=('ack', self._name), record=False)
+        if wake := getattr(self.chart, '_wake', None):
+            wake.set()
+        return future
+
+    @property
+    def in_flight(self) -> int:
+        """
+        The number of acknowledgements still awaited.
+        """
+        return len(self._pending)
+
+    async def flush(self):
+        """
+        Waits until the page has evaluated every script queued so far.
+        """
+        await self._acknowledgement()
+
+    async def set(self, *args, **kwargs):
+        self.chart.set(*args, **kwargs)
+        await self._acknowledgement()
+
+    async def update(self, *args, **kwargs):
+        self.chart.update(*args, **kwargs)
+        await self._acknowledgement()
+
+    async def update_from_tick(self, *args, **kwargs):
+        self.chart.update_from_tick(*args, **kwargs)
+        await self._acknowledgement()
+
+    def exit(self):
+        for future in self._pending.values():
+            future.cancel()
+        self._pending.clear()
+        self.chart.exit()
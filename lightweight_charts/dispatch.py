@@ -0,0 +1,159 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Literal, Optional
+
+POLICY = Literal['inline', 'serial', 'concurrent', 'latest']
+
+_local = threading.local()
+
+
+def check_cancelled():
+    """
+    Raises `asyncio.CancelledError` in a handler thread whose invocation was superseded,
+    so a stale handler stops at its next call to the chart.
+    """
+    invocation = getattr(_local, 'invocation', None)
+    if invocation is not None and invocation.cancelled:
+        raise asyncio.CancelledError
+
+
+def handler_loop() -> Optional[asyncio.AbstractEventLoop]:
+    """
+    :return: the event loop that dispatched the handler running in this thread, or None outside handler threads.
+    """
+    invocation = getattr(_local, 'invocation', None)
+    return invocation.loop if invocation is not None else None
+
+
+class _Invocation:
+    __slots__ = ('cancelled', 'task', 'is_async', 'loop')
+
+    def __init__(self, is_async: bool, loop: asyncio.AbstractEventLoop):
+        self.cancelled = False
+        self.task = None
+        self.is_async = is_async
+        self.loop = loop
+
+    def cancel(self):
+        self.cancelled = True
+        # A thread cannot be interrupted; it stops at its next chart call (see `check_cancelled`).
+        if self.is_async and self.task is not None:
+            self.task.cancel()
+
+
+class Dispatcher:
+    """
+    Runs the handlers of page events without blocking the event loop of `show_async`:
+    synchronous handlers in a bounded thread pool, coroutine handlers as tasks.\n
+    The policy of a handler orders its invocations:\n
+    - 'inline': awaited on the event loop before the next event is read, as without a dispatcher.
+    - 'serial': one at a time, in the order the events arrived.
+    - 'concurrent': invocations overlap.
+    - 'latest': a new event cancels the invocations still pending or running, so only the newest
+      result reaches the chart; e.g. for rapid switcher clicks.\n
+    Unless `default` says otherwise, synchronous handlers run 'inline' and coroutine handlers
+    'concurrent', so a slow coroutine does not hold up the events behind it; give one 'serial' or
+    'inline' if its invocations must not overlap.\n
+    A synchronous handler given a policy other than 'inline' runs in a worker thread, so
+    the chart data it changes must not be changed by other handlers at the same time. Chart events
+    it emits, such as `events.new_bar`, are handed back to the event loop.\n
+    Internal handlers (names starting with '__') always run inline.
+    """
+    def __init__(self, max_workers: int = 4, default: Optional[POLICY] = None):
+        self.max_workers = max_workers
+        self.default = default
+        self.policies = {}
+        self._executor = None
+        self._tails = {}
+        self._live = {}
+
+    def set_policy(self, target, policy: POLICY):
+        """
+        :param target: a handler name, or the object owning the handler: a topbar widget,
+        a horizontal line or an event of `chart.events`.
+        """
+        name = target if isinstance(target, str) else getattr(target, '_name', None) or target.id
+        self.policies[name] = policy
+
+    def policy(self, name: str, func: callable = None) -> POLICY:
+        if name.startswith('__'):
+            return 'inline'
+        if name in self.policies:
+            return self.policies[name]
+        if self.default is not None:
+            return self.default
+        return 'concurrent' if asyncio.iscoroutinefunction(func) else 'inline'
+
+    async def dispatch(self, name: str, func: callable, args: list, metrics=None) -> Optional[asyncio.Task]:
+        """
+        Awaits `inline` handlers; schedules the others and returns their task.\n
+        :param metrics: the `Metrics` the duration of the handler is added to.
+        """
+        policy = self.policy(name, func)
+        if policy == 'inline':
+            await self._call(name, func, args, None, metrics)
+            return None
+        invocation = _Invocation(asyncio.iscoroutinefunction(func), asyncio.get_running_loop())
+        if policy == 'latest':
+            for stale in self._live.get(name, ()):
+                stale.cancel()
+        previous = self._tails.get(name) if policy != 'concurrent' else None
+        invocation.task = asyncio.create_task(self._run(name, func, args, invocation, previous, metrics))
+        self._tails[name] = invocation.task
+        self._live.setdefault(name, set()).add(invocation)
+        invocation.task.add_done_callback(lambda _: self._done(name, invocation))
+        return invocation.task
+
+    def _done(self, name: str, invocation: _Invocation):
+        live = self._live.get(name)
+        live.discard(invocation)
+        if not live:
+            del self._live[name]
+        if self._tails.get(name) is invocation.task:
+            del self._tails[name]
+
+    async def _run(self, name, func, args, invocation: _Invocation, previous: Optional[asyncio.Task], metrics):
+        if previous is not None:
+            await asyncio.wait([previous])
+        if invocation.cancelled:
+            return
+        try:
+            await self._call(name, func, args, invocation, metrics)
+        except asyncio.CancelledError:
+            if not invocation.cancelled:
+                raise
+        except Exception as e:
+            asyncio.get_running_loop().call_exception_handler({
+                'message': f'Exception in the handler of "{name}"', 'exception': e,
+            })
+
+    async def _call(self, name, func, args, invocation: Optional[_Invocation], metrics):
+        start = time.perf_counter()
+        if asyncio.iscoroutinefunction(func):
+            await func(*args)
+        elif invocation is None:
+            func(*args)
+        else:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix='lightweight-charts')
+            await asyncio.get_running_loop().run_in_executor(self._executor, self._call_sync, invocation, func, args)
+        if metrics:
+            metrics.handler(name, time.perf_counter() - start)
+
+    @staticmethod
+    def _call_sync(invocation: _Invocation, func, args):
+        _local.invocation = invocation
+        try:
+            func(*args)
+        finally:
+            _local.invocation = None
+
+    def shutdown(self):
+        for live in self._live.values():
+            for invocation in live:
+                invocation.cancel()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
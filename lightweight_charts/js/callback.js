@@ -57,14 +57,17 @@ if (!window.TopBar) {
                 switcherElement.appendChild(itemEl);
                 return itemEl;
             });
-            widget.onItemClicked = (item)=> {
-                if (item === activeItem) return
+            widget.select = (item)=> {
                 widget.intervalElements.forEach((element, index) => {
                     element.style.backgroundColor = items[index] === item ? pane.activeBackgroundColor : 'transparent'
                     element.style.color = items[index] === item ? pane.activeColor : pane.color
                     element.style.fontWeight = items[index] === item ? '500' : 'normal'
                 })
                 activeItem = item;
+            }
+            widget.onItemClicked = (item)=> {
+                if (item === activeItem) return
+                widget.select(item)
                 window.callbackFunction(`${widget.callbackName}_~_${item}`);
             }
             this.appendWidget(switcherElement, align, true)
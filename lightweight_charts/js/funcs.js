@@ -106,7 +106,6 @@ if (!window.Chart) {
 
         }
         makeCandlestickSeries() {
-            this.markers = []
             this.horizontal_lines = []
             this.data = []
             this.precision = 2
@@ -116,6 +115,7 @@ if (!window.Chart) {
                 color: 'rgb(0, 120, 255)', upColor: up, borderUpColor: up, wickUpColor: up,
                 downColor: down, borderDownColor: down, wickDownColor: down, lineWidth: 2,
             })
+            this.markers = new MarkerStore(this.series, this.chart)
             this.volumeSeries = this.chart.addHistogramSeries({
                 color: '#26a69a',
                 priceFormat: {type: 'volume'},
@@ -192,13 +192,96 @@ if (!window.Chart) {
 
         deleteLine() {
             this.chart.series.removePriceLine(this.line)
-            this.chart.horizontal_lines.splice(this.chart.horizontal_lines.indexOf(this))
+            this.chart.horizontal_lines.splice(this.chart.horizontal_lines.indexOf(this), 1)
             delete this
         }
     }
 
     window.HorizontalLine = HorizontalLine
 
+    class MarkerStore {
+        constructor(series, chart) {
+            this.flush = this.flush.bind(this)
+            this.series = series
+            this.chart = chart
+            this.markers = new Map()
+            this.sorted = []
+            this.dirty = false
+            this.scheduled = false
+            this.visibleOnly = false
+            this.applied = null
+        }
+
+        toJSON() {
+            return Array.from(this.markers.values())
+        }
+
+        add(markers) {
+            markers.forEach(marker => this.markers.set(marker.id, marker))
+            this.schedule()
+        }
+
+        remove(ids) {
+            ids.forEach(id => this.markers.delete(id))
+            this.schedule()
+        }
+
+        replace(markers) {
+            this.markers.clear()
+            this.add(markers)
+        }
+
+        clear() {
+            this.replace([])
+        }
+
+        schedule() {
+            this.dirty = true
+            if (this.scheduled) return
+            this.scheduled = true
+            requestAnimationFrame(this.flush)
+        }
+
+        setVisibleOnly(enabled) {
+            if (enabled === this.visibleOnly) return
+            this.visibleOnly = enabled
+            let timeScale = this.chart.timeScale()
+            if (enabled) timeScale.subscribeVisibleTimeRangeChange(this.flush)
+            else timeScale.unsubscribeVisibleTimeRangeChange(this.flush)
+            this.schedule()
+        }
+
+        bound(time, upper) {
+            let low = 0, high = this.sorted.length
+            while (low < high) {
+                let mid = (low + high) >> 1
+                if (this.sorted[mid].time < time || (upper && this.sorted[mid].time === time)) low = mid + 1
+                else high = mid
+            }
+            return low
+        }
+
+        flush() {
+            this.scheduled = false
+            if (this.dirty) {
+                this.sorted = Array.from(this.markers.values()).sort((a, b) => a.time - b.time)
+            }
+            let start = 0, end = this.sorted.length
+            let range = this.visibleOnly ? this.chart.timeScale().getVisibleRange() : null
+            if (range) {
+                start = this.bound(range.from, false)
+                end = this.bound(range.to, true)
+            }
+            // setMarkers replaces every marker on the series, so skip it when nothing changed.
+            if (!this.dirty && this.applied && this.applied[0] === start && this.applied[1] === end) return
+            this.dirty = false
+            this.applied = [start, end]
+            this.series.setMarkers(start === 0 && end === this.sorted.length ? this.sorted : this.sorted.slice(start, end))
+        }
+    }
+
+    window.MarkerStore = MarkerStore
+
     class Legend {
         constructor(chart) {
             this.legendHandler = this.legendHandler.bind(this)
@@ -466,18 +549,155 @@ function lastBar(obj) {
     return obj[obj.length-1]
 }
 
+function datasetRows(time, fields, palettes) {
+    const names = Object.keys(fields)
+    const paletteNames = Object.keys(palettes)
+    const rows = new Array(time.length)
+    for (let i = 0; i < time.length; i++) {
+        const row = {time: time[i]}
+        for (const name of names) {
+            const value = fields[name][i]
+            if (value !== null && value === value) row[name] = value
+        }
+        for (const name of paletteNames) {
+            row[name] = palettes[name][0][palettes[name][1][i]]
+        }
+        rows[i] = row
+    }
+    return rows
+}
+
+function applyDataset(time, entries) {
+    // Build every series' rows first so the chart is never left partially updated.
+    const rows = entries.map(entry => datasetRows(time, entry.fields, entry.palettes))
+    entries.forEach((entry, i) => {
+        if (entry.mirror) entry.mirror.data = rows[i]
+        entry.series.setData(rows[i])
+    })
+}
+
+function updateDataset(time, entries) {
+    // Updates series with bars in time order, the first of which may replace the last bar shown.
+    entries.forEach(entry => {
+        const mirror = entry.mirror ? entry.mirror.data : null
+        datasetRows(time, entry.fields, entry.palettes).forEach(row => {
+            if (mirror) {
+                if (mirror.length && lastBar(mirror).time === row.time) mirror[mirror.length - 1] = row
+                else mirror.push(row)
+            }
+            entry.series.update(row)
+        })
+    })
+}
+
+function prependDataset(chart, token, time, entries, merge) {
+    // Queues an older chunk of a progressive load, unless other data replaced the data shown.
+    // The chunks queued are merged ahead of the data shown when `merge` is set.
+    if (chart.loadToken !== token) return
+    if (!chart.loadChunks || chart.loadChunks.token !== token) {
+        chart.loadChunks = {token: token, entries: entries, chunks: []}
+    }
+    chart.loadChunks.chunks.push(entries.map(entry => datasetRows(time, entry.fields, entry.palettes)))
+    if (merge) mergeChunks(chart, token)
+}
+
+function mergeChunks(chart, token) {
+    // Merges the queued chunks, which arrived newest first, with one setData per series.
+    const pending = chart.loadChunks
+    chart.loadChunks = null
+    if (!pending || pending.token !== token || chart.loadToken !== token) return
+    const chunks = pending.chunks.reverse()
+    pending.entries.forEach((entry, i) => {
+        const merged = [].concat(...chunks.map(chunk => chunk[i]), entry.mirror ? entry.mirror.data : entry.series.data())
+        if (entry.mirror) entry.mirror.data = merged
+        entry.series.setData(merged)
+    })
+}
+
+function trimSeries(obj, cutoff) {
+    // Drops the bars before `cutoff` from a series, its volume and its data mirror.
+    const kept = row => row.time >= cutoff
+    if (obj.data) obj.data = obj.data.filter(kept)
+    obj.series.setData(obj.series.data().filter(kept))
+    if (obj.volumeSeries) obj.volumeSeries.setData(obj.volumeSeries.data().filter(kept))
+}
+
+// Datasets kept by `storeDataset`, least recently shown first.
+const datasets = {entries: new Map(), bytes: 0}
+
+function storeDataset(chart, token, bytes, budget, time, entries) {
+    // Builds the rows once, so showing the dataset later costs a setData call and no transfer.
+    const rows = entries.map(entry => datasetRows(time, entry.fields, entry.palettes))
+    datasets.entries.set(`${chart.id} ${token}`, {
+        chart: chart,
+        token: token,
+        bytes: bytes,
+        entries: entries.map((entry, i) => ({series: entry.series, mirror: entry.mirror, rows: rows[i]})),
+    })
+    datasets.bytes += bytes
+    const evicted = {}
+    for (const [name, stored] of datasets.entries) {
+        if (datasets.bytes <= budget) break
+        datasets.entries.delete(name)
+        datasets.bytes -= stored.bytes
+        if (!evicted[stored.chart.id]) evicted[stored.chart.id] = []
+        evicted[stored.chart.id].push(stored.token)
+    }
+    for (const [id, tokens] of Object.entries(evicted)) {
+        window.callbackFunction(`__datasets__${id}_~_evicted;;;${tokens.join(';;;')}`)
+    }
+}
+
+function dropDataset(chart, token) {
+    const name = `${chart.id} ${token}`
+    const stored = datasets.entries.get(name)
+    if (!stored) return
+    datasets.entries.delete(name)
+    datasets.bytes -= stored.bytes
+}
+
+function showDataset(chart, token) {
+    const name = `${chart.id} ${token}`
+    const stored = datasets.entries.get(name)
+    if (!stored) {
+        window.callbackFunction(`__datasets__${chart.id}_~_missing;;;${token}`)
+        return
+    }
+    datasets.entries.delete(name)
+    datasets.entries.set(name, stored)
+    stored.entries.forEach(entry => {
+        // The mirror is appended to by updates, so it must not share the stored rows.
+        if (entry.mirror) entry.mirror.data = entry.rows.slice()
+        entry.series.setData(entry.rows)
+    })
+}
+
+function traceAck(seq) {
+    // Reports the first frame drawn after a traced script, in epoch seconds.
+    requestAnimationFrame(() => window.callbackFunction(
+        `__trace___~_${seq};;;rendered;;;${(performance.timeOrigin + performance.now()) / 1000}`
+    ))
+}
+
+function acknowledge(name, seq) {
+    // Confirms that the scripts queued up to this one have been evaluated.
+    window.callbackFunction(`${name}_~_${seq}`)
+}
+
 function calculateTrendLine(startDate, startValue, endDate, endValue, chart, ray=false) {
+    // Charts set with copy=False keep no mirror of their data.
+    const data = chart.data || chart.series.data()
     let reversed = false
     if (stampToDate(endDate).getTime() < stampToDate(startDate).getTime()) {
         reversed = true;
         [startDate, endDate] = [endDate, startDate];
     }
     let startIndex
-    if (stampToDate(startDate).getTime() < stampToDate(chart.data[0].time).getTime()) {
+    if (stampToDate(startDate).getTime() < stampToDate(data[0].time).getTime()) {
         startIndex = 0
     }
     else {
-        startIndex = chart.data.findIndex(item => stampToDate(item.time).getTime() === stampToDate(startDate).getTime())
+        startIndex = data.findIndex(item => stampToDate(item.time).getTime() === stampToDate(startDate).getTime())
     }
 
     if (startIndex === -1) {
@@ -485,14 +705,14 @@ function calculateTrendLine(startDate, startValue, endDate, endValue, chart, ray
     }
     let endIndex
     if (ray) {
-        endIndex = chart.data.length+1000
+        endIndex = data.length+1000
         startValue = endValue
     }
     else {
-        endIndex = chart.data.findIndex(item => stampToDate(item.time).getTime() === stampToDate(endDate).getTime())
+        endIndex = data.findIndex(item => stampToDate(item.time).getTime() === stampToDate(endDate).getTime())
         if (endIndex === -1) {
-            let barsBetween = (endDate-lastBar(chart.data).time)/chart.interval
-            endIndex = chart.data.length-1+barsBetween
+            let barsBetween = (endDate-lastBar(data).time)/chart.interval
+            endIndex = data.length-1+barsBetween
         }
     }
 
@@ -502,12 +722,12 @@ function calculateTrendLine(startDate, startValue, endDate, endValue, chart, ray
     let currentDate = null
     let iPastData = 0
     for (let i = 0; i <= numBars; i++) {
-        if (chart.data[startIndex+i]) {
-            currentDate = chart.data[startIndex+i].time
+        if (data[startIndex+i]) {
+            currentDate = data[startIndex+i].time
         }
         else {
             iPastData ++
-            currentDate = lastBar(chart.data).time+(iPastData*chart.interval)
+            currentDate = lastBar(data).time+(iPastData*chart.interval)
         }
 
         const currentValue = reversed ? startValue + rate_of_change * (numBars - i) : startValue + rate_of_change * i;
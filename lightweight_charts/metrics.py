@@ -0,0 +1,107 @@
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+
+class Metrics:
+    """
+    Counters and timings collected by a window while metrics are enabled.\n
+    Scripts are attributed to the pane (series, chart, widget...) and method that submitted
+    them; `serialization` and `transport` accumulate the time spent building payloads and
+    handing scripts to the webview.
+    """
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.scripts = Counter()
+        self.bytes = Counter()
+        self.handler_calls = Counter()
+        self.handler_seconds = defaultdict(float)
+        self.seconds = defaultdict(float)
+        self.calls = Counter()
+
+    def script(self, owner: str, method: str, script: str):
+        self.scripts[owner, method] += 1
+        self.bytes[owner, method] += len(script.encode())
+
+    @contextmanager
+    def timer(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[name] += time.perf_counter() - start
+            self.calls[name] += 1
+
+    def handler(self, name: str, seconds: float):
+        self.handler_calls[name] += 1
+        self.handler_seconds[name] += seconds
+
+    def snapshot(self) -> dict:
+        return {
+            'scripts': [
+                {'owner': owner, 'method': method, 'count': n, 'bytes': self.bytes[owner, method]}
+                for (owner, method), n in self.scripts.most_common()
+            ],
+            'handlers': {
+                name: {'count': n, 'seconds': self.handler_seconds[name]}
+                for name, n in self.handler_calls.items()
+            },
+            'timings': {name: {'count': self.calls[name], 'seconds': s} for name, s in self.seconds.items()},
+        }
+
+
+def queue_depth(queue):
+    try:
+        return queue.qsize()
+    except NotImplementedError:
+        # multiprocessing queues cannot report their size on macOS.
+        return None
+
+
+def _label(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def to_prometheus(stats: dict, prefix: str = 'lightweight_charts') -> str:
+    """
+    Formats the dictionary returned by `Window.stats` in the Prometheus text exposition format.
+    """
+    lines = []
+
+    def metric(name, kind, samples):
+        lines.append(f'# TYPE {prefix}_{name} {kind}')
+        for labels, value in samples:
+            label_text = ','.join(f'{k}="{_label(v)}"' for k, v in labels.items())
+            lines.append(f'{prefix}_{name}{{{label_text}}} {value}' if label_text else f'{prefix}_{name} {value}')
+
+    metric('queue_depth', 'gauge', [
+        ({'queue': name}, depth) for name, depth in stats['queues'].items() if depth is not None
+    ])
+    metric('js_objects', 'gauge', [({'kind': kind}, n) for kind, n in stats['objects'].items()])
+    metric('handlers_registered', 'gauge', [({}, stats['handlers_registered'])])
+    if stats.get('payload_cache') is not None:
+        cache = stats['payload_cache']
+        metric('payload_cache_bytes', 'gauge', [({}, cache['bytes'])])
+        metric('payload_cache_requests_total', 'counter', [
+            ({'result': 'hit'}, cache['hits']), ({'result': 'miss'}, cache['misses'])
+        ])
+        metric('payload_cache_evictions_total', 'counter', [({}, cache['evictions'])])
+    if stats.get('scripts') is not None:
+        metric('scripts_total', 'counter', [
+            ({'owner': s['owner'], 'method': s['method']}, s['count']) for s in stats['scripts']
+        ])
+        metric('script_bytes_total', 'counter', [
+            ({'owner': s['owner'], 'method': s['method']}, s['bytes']) for s in stats['scripts']
+        ])
+        metric('handler_calls_total', 'counter', [
+            ({'handler': name}, h['count']) for name, h in stats['handlers'].items()
+        ])
+        metric('handler_seconds_total', 'counter', [
+            ({'handler': name}, h['seconds']) for name, h in stats['handlers'].items()
+        ])
+        metric('seconds_total', 'counter', [
+            ({'stage': name}, t['seconds']) for name, t in stats['timings'].items()
+        ])
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,171 @@
+import heapq
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from itertools import count
+from typing import Iterable
+
+
+class Prefetcher:
+    """
+    Loads the data a user is likely to ask for next in the background, into a bounded LRU cache.\n
+    Once a symbol is shown, schedule the other options of a switcher and the top search matches;
+    the handlers then read through `get`, which returns warm data, waits for a load in progress,
+    or loads on the spot. Loads are grouped (e.g. by symbol) so a change of symbol cancels the
+    ones still queued.\n
+        prefetch = Prefetcher(lambda symbol, timeframe: query(symbol, timeframe))
+
+        def on_timeframe(chart):
+            chart.set(prefetch.get(symbol, chart.topbar['timeframe'].value))
+
+        prefetch.cancel()
+        prefetch.switcher(chart.topbar['timeframe'], lambda tf: (symbol, tf), group=symbol)
+    :param loader: called with the items of a key, in a worker thread.
+    :param max_entries: the number of results cached.
+    :param max_workers: the number of loads run at once.
+    """
+    def __init__(self, loader: callable, max_entries: int = 32, max_workers: int = 2):
+        self.loader = loader
+        self.max_entries = max_entries
+        self.max_workers = max_workers
+        self.hits = self.misses = self.prefetched = 0
+        self._cache = OrderedDict()
+        self._loading = {}
+        self._queue = []
+        self._queued = {}
+        self._generations = {}
+        self._order = count()
+        self._workers = []
+        self._closed = False
+        self._lock = threading.Lock()
+        self._ready = threading.Condition(self._lock)
+
+    def get(self, *key):
+        """
+        :return: the result of `loader(*key)`, from the cache if it was prefetched.
+        """
+        load = False
+        with self._lock:
+            if key in self._cache:
+                self.hits += 1
+                self._cache.move_to_end(key)
+                return self._cache[key]
+            future = self._loading.get(key)
+            if future is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+                self._unqueue(key)
+                future = self._start(key)
+                load = True
+        if load:
+            self._load(key, future, None, None)
+        return future.result()
+
+    def cached(self, *key) -> bool:
+        return key in self._cache
+
+    def schedule(self, keys: Iterable[tuple], priority: int = 0, group=None):
+        """
+        Queues keys to load in the background; lower priorities load first.
+        """
+        with self._lock:
+            for key in keys:
+                key = tuple(key)
+                if key in self._cache or key in self._loading or key in self._queued:
+                    continue
+                entry = [priority, next(self._order), key, group, self._generations.get(group, 0)]
+                self._queued[key] = entry
+                heapq.heappush(self._queue, entry)
+            self._spawn()
+            self._ready.notify_all()
+
+    def switcher(self, widget, key: callable, priority: int = 0, group=None):
+        """
+        Schedules `key(option)` for every option of a `SwitcherWidget` besides the one selected.
+        """
+        self.schedule((key(option) for option in widget.options if option != widget.value), priority, group)
+
+    def search(self, matches: list, key: callable, top: int = 3, priority: int = 1, group=None):
+        """
+        Schedules `key(match)` for the first `top` search matches, the best match first.
+        """
+        self.schedule((key(match) for match in matches[:top]), priority, group)
+
+    def cancel(self, group=None):
+        """
+        Drops the queued loads of `group`, or every queued load if it is None. Loads already running
+        complete, but their results are not cached.
+        """
+        with self._lock:
+            groups = {entry[3] for entry in self._queued.values()} | set(self._generations)
+            for g in (groups if group is None else {group}):
+                self._generations[g] = self._generations.get(g, 0) + 1
+            for key, entry in list(self._queued.items()):
+                if group is None or entry[3] == group:
+                    self._unqueue(key)
+
+    def stats(self) -> dict:
+        return {
+            'hits': self.hits, 'misses': self.misses, 'prefetched': self.prefetched,
+            'cached': len(self._cache), 'queued': len(self._queued), 'loading': len(self._loading),
+        }
+
+    def shutdown(self):
+        with self._lock:
+            self._closed = True
+            self._ready.notify_all()
+        self.cancel()
+
+    def _unqueue(self, key):
+        entry = self._queued.pop(key, None)
+        if entry is not None:
+            # Removed lazily from the heap; workers skip entries whose key is cleared.
+            entry[2] = None
+
+    def _start(self, key) -> Future:
+        future = Future()
+        self._loading[key] = future
+        return future
+
+    def _spawn(self):
+        while len(self._workers) < min(self.max_workers, len(self._queued)):
+            worker = threading.Thread(target=self._work, daemon=True, name='lightweight-charts-prefetch')
+            self._workers.append(worker)
+            worker.start()
+
+    def _work(self):
+        while True:
+            with self._lock:
+                while not self._closed and not self._queue:
+                    self._ready.wait()
+                if self._closed:
+                    self._workers.remove(threading.current_thread())
+                    return
+                _, _, key, group, generation = heapq.heappop(self._queue)
+                if key is None:
+                    continue
+                del self._queued[key]
+                future = self._start(key)
+            self._load(key, future, group, generation)
+
+    def _load(self, key, future: Future, group, generation):
+        future.set_running_or_notify_cancel()
+        try:
+            result = self.loader(*key)
+        except Exception as e:
+            with self._lock:
+                self._loading.pop(key, None)
+            future.set_exception(e)
+            return
+        with self._lock:
+            self._loading.pop(key, None)
+            # Loads of a cancelled group are handed to whoever waits for them, but not cached.
+            if generation is None or self._generations.get(group, 0) == generation:
+                self._cache[key] = result
+                self._cache.move_to_end(key)
+                while len(self._cache) > self.max_entries:
+                    self._cache.popitem(last=False)
+                if generation is not None:
+                    self.prefetched += 1
+        future.set_result(result)
@@ -0,0 +1,59 @@
+import threading
+from itertools import count
+
+_ids = count(1)
+
+
+class ProgressiveLoad:
+    """
+    The chunks of a `set_progressive` still being merged into the chart.\n
+    :param total: the number of rows being loaded.
+    :param on_progress: called with the rows loaded so far and `total`, after each chunk.
+    """
+    def __init__(self, total: int, on_progress: callable = None):
+        self.id = next(_ids)
+        self.total = total
+        self.loaded = 0
+        self.on_progress = on_progress
+        self.error = None
+        self._cancelled = threading.Event()
+        self._done = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def cancel(self):
+        """
+        Stops the load after the chunk in progress; the rows merged so far are kept.
+        """
+        self._cancelled.set()
+
+    def wait(self, timeout: float = None) -> bool:
+        """
+        :return: False if the load was still running after `timeout` seconds.
+        """
+        return self._done.wait(timeout)
+
+    def _advance(self, rows: int):
+        self.loaded += rows
+        if self.on_progress:
+            self.on_progress(self.loaded, self.total)
+
+    def _start(self, target: callable, *args):
+        def run():
+            try:
+                target(*args)
+            except Exception as e:
+                self.error = e
+                raise
+            finally:
+                self._done.set()
+        threading.Thread(target=run, daemon=True, name='lightweight-charts-load').start()
+
+    def _finish(self):
+        self._done.set()
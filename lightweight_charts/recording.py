@@ -0,0 +1,141 @@
+import asyncio
+import gzip
+import json
+import time
+
+from . import tracing
+
+FORMAT_VERSION = 1
+
+
+class Recording:
+    """
+    A timestamped stream of the scripts a window handed to its transport.\n
+    Saved as gzip-compressed JSON lines: a header, then one `[seconds, script]` line per script,
+    where `seconds` is the time since recording started.
+    """
+    def __init__(self, events: list = None, meta: dict = None):
+        self.events = events if events is not None else []
+        self.meta = meta or {}
+
+    @property
+    def duration(self) -> float:
+        return self.events[-1][0] if self.events else 0.0
+
+    @property
+    def bytes(self) -> int:
+        return sum(len(script.encode()) for _, script in self.events)
+
+    def save(self, path: str):
+        with gzip.open(path, 'wt', encoding='utf-8') as f:
+            f.write(json.dumps({'version': FORMAT_VERSION, **self.meta}, separators=(',', ':')) + '\n')
+            for seconds, script in self.events:
+                f.write(json.dumps([round(seconds, 6), script], separators=(',', ':')) + '\n')
+
+    @classmethod
+    def load(cls, path: str) -> 'Recording':
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            meta = json.loads(f.readline())
+            if meta.pop('version', None) != FORMAT_VERSION:
+                raise ValueError(f'"{path}" is not a recording of format version {FORMAT_VERSION}.')
+            events = [tuple(json.loads(line)) for line in f if line.strip()]
+        return cls(events, meta)
+
+
+class Recorder:
+    """
+    Captures every script a window sends through its `script_func`.\n
+    Can be used as a context manager:\n
+        with Recorder(chart.win, 'session.jsonl.gz'):
+            ...
+    """
+    def __init__(self, window, path: str = None):
+        self.window = getattr(window, 'win', window)
+        self.path = path
+        self.recording = Recording(meta={'recorded_at': time.time()})
+        self._script_func = self._batch_func = None
+        self._start = None
+
+    def start(self):
+        if self._script_func is not None:
+            return self
+        self._start = time.perf_counter()
+        self._script_func, self._batch_func = self.window.script_func, self.window.batch_func
+        self.window.script_func = self._record
+        if self._batch_func is not None:
+            self.window.batch_func = self._record_batch
+        return self
+
+    def stop(self) -> Recording:
+        if self._script_func is not None:
+            self.window.script_func, self.window.batch_func = self._script_func, self._batch_func
+            self._script_func = self._batch_func = None
+        if self.path:
+            self.recording.save(self.path)
+        return self.recording
+
+    def _record(self, script: str, *args):
+        seq, recorded = tracing.unwrap(script)
+        if seq is not None:
+            recorded = recorded.rsplit('\n', 1)[0]
+        self.recording.events.append((time.perf_counter() - self._start, recorded))
+        self._script_func(script, *args)
+
+    def _record_batch(self, scripts: list, *args):
+        self.recording.events.append((time.perf_counter() - self._start, '\n'.join(scripts)))
+        self._batch_func(scripts, *args)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *_):
+        self.stop()
+
+
+def _schedule(recording: Recording, speed: float):
+    """
+    Yields (delay, script) pairs, where delay is the time to wait before sending the script.
+    """
+    start = time.perf_counter()
+    for seconds, script in recording.events:
+        delay = seconds / speed - (time.perf_counter() - start) if speed else 0
+        yield delay, script
+
+
+def replay(recording, target, speed: float = 1.0) -> float:
+    """
+    Sends a recorded script stream back through a window's transport.\n
+    :param recording: a Recording, or the path of a saved recording.
+    :param target: a Window, a chart, or a callable taking a script.
+    :param speed: 1.0 keeps the original timing, 2.0 plays twice as fast; None sends as fast as possible.
+    :return: the time the replay took, in seconds.
+    """
+    recording = Recording.load(recording) if isinstance(recording, str) else recording
+    send = _script_func(target)
+    start = time.perf_counter()
+    for delay, script in _schedule(recording, speed):
+        if delay > 0:
+            time.sleep(delay)
+        send(script)
+    return time.perf_counter() - start
+
+
+async def replay_async(recording, target, speed: float = 1.0) -> float:
+    """
+    The same as `replay`, without blocking the event loop (so `show_async` keeps dispatching events).
+    """
+    recording = Recording.load(recording) if isinstance(recording, str) else recording
+    send = _script_func(target)
+    start = time.perf_counter()
+    for delay, script in _schedule(recording, speed):
+        if delay > 0:
+            await asyncio.sleep(delay)
+        send(script)
+    return time.perf_counter() - start
+
+
+def _script_func(target) -> callable:
+    if callable(target) and not hasattr(target, 'script_func'):
+        return target
+    window = getattr(target, 'win', target)
+    return window.script_func
@@ -0,0 +1,216 @@
+import threading
+import time
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from . import timecodec
+
+
+class Replay:
+    """
+    Plays historical bars or ticks into a chart at a multiple of real time, e.g. to review a session.\n
+    A background thread runs the clock. Each frame, the rows that came due are sent as one batch (ticks
+    through `update_from_ticks`), and the next frame waits until the page has evaluated it, so high
+    speeds send larger batches rather than more scripts. Columns of a bar source named after the
+    chart's lines advance those lines, markers appear once their time is reached, and `on_frame` is
+    called after every batch, e.g. to update indicators computed in Python.\n
+    Create it with `Candlestick.replay`.
+    """
+    # Gaps longer than this many bar intervals (nights, weekends) are skipped.
+    MAX_GAP = 10
+
+    def __init__(self, chart, source: pd.DataFrame, ticks: bool = False, speed: float = 1.0, start=None,
+                 fps: int = 30, markers: list = None, cumulative_volume: bool = False,
+                 on_frame: callable = None):
+        self.chart = chart
+        self.ticks = ticks
+        self.fps = fps
+        self.cumulative_volume = cumulative_volume
+        self.on_frame = on_frame
+        self.error = None
+        if ticks:
+            if chart.candle_data.empty:
+                raise ValueError('Set the bars preceding the ticks before replaying them.')
+            self._source = source
+            self._times = chart._tick_seconds(source)
+            self._base = chart.candle_data.copy()
+            self._base.loc[self._base.index[-1]] = chart._last_bar
+        else:
+            self._source, _ = chart._df_time_columns(source)
+            self._times = self._source['time'].to_numpy()
+        if (np.diff(self._times) < 0).any():
+            raise ValueError('The source must be in time order.')
+        markers = sorted(markers or [], key=lambda marker: timecodec.to_seconds(marker['time']))
+        self._markers = markers
+        self._marker_times = np.array([timecodec.to_seconds(marker['time']) for marker in markers])
+        self._marker_ids = []
+
+        self._paused = False
+        self._stopped = False
+        self._steps = 0
+        self._seek = None
+        self._position = 0
+        self._shown_markers = 0
+        self._clock = None
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._done = threading.Event()
+        self.speed = speed
+
+        self._seek_to(self._times[0 if ticks else min(1, len(self._times) - 1)] if start is None
+                      else timecodec.to_seconds(start))
+        self._thread = threading.Thread(target=self._run, daemon=True, name='lightweight-charts-replay')
+        self._thread.start()
+
+    @property
+    def time(self) -> Optional[float]:
+        """
+        The replay clock, in epoch seconds.
+        """
+        return self._clock
+
+    @property
+    def position(self) -> int:
+        """
+        The number of source rows played.
+        """
+        return self._position
+
+    @property
+    def done(self) -> bool:
+        """
+        Whether the source has played out; a `seek` back plays it again.
+        """
+        return self._done.is_set()
+
+    @property
+    def paused(self) -> bool:
+        return self._paused
+
+    @property
+    def speed(self) -> float:
+        return self._speed
+
+    @speed.setter
+    def speed(self, speed: float):
+        if speed <= 0:
+            raise ValueError('The speed must be positive.')
+        with self._lock:
+            self._speed = float(speed)
+
+    def play(self):
+        with self._lock:
+            self._paused = False
+            self._wake.notify()
+
+    def pause(self):
+        with self._lock:
+            self._paused = True
+
+    def step(self, count: int = 1):
+        """
+        Plays the next `count` rows, and pauses.
+        """
+        with self._lock:
+            self._paused = True
+            self._steps += count
+            self._wake.notify()
+
+    def seek(self, time):
+        """
+        Moves the replay to `time`: the rows before it are shown at once, the rows after it are removed.
+        """
+        with self._lock:
+            self._seek = timecodec.to_seconds(time)
+            self._wake.notify()
+
+    def stop(self):
+        with self._lock:
+            self._stopped = True
+            self._wake.notify()
+
+    def wait(self, timeout: float = None) -> bool:
+        """
+        Waits until the source has played out, or the replay is stopped.\n
+        :return: False if the replay was still playing after `timeout` seconds.
+        """
+        return self._done.wait(timeout)
+
+    def _run(self):
+        try:
+            self._play()
+        except Exception as e:
+            self.error = e
+            raise
+        finally:
+            self._done.set()
+
+    def _play(self):
+        frame = 1 / self.fps
+        last = time.monotonic()
+        while True:
+            with self._lock:
+                while not self._stopped and self._seek is None and not self._steps and (
+                        self._paused or self._position == len(self._times)):
+                    self._wake.wait()
+                    last = time.monotonic()
+                if self._stopped:
+                    return
+                seek, self._seek = self._seek, None
+                # Steps asked for along with a seek are played from the new position, on the next pass.
+                steps, self._steps = (0, self._steps) if seek is not None else (self._steps, 0)
+                paused, speed = self._paused, self._speed
+            if seek is not None:
+                self._seek_to(seek)
+            elif steps and self._position < len(self._times):
+                self._advance(min(self._position + steps, len(self._times)))
+                self._clock = max(self._clock, float(self._times[self._position - 1]))
+            elif not paused:
+                time.sleep(max(frame - (time.monotonic() - last), 0))
+                now = time.monotonic()
+                self._clock += (now - last) * speed
+                last = now
+                stop = int(np.searchsorted(self._times, self._clock, side='right'))
+                if stop == self._position:
+                    # Nothing is due yet; a long gap is skipped.
+                    if self._times[stop] - self._clock > self.MAX_GAP * self.chart._interval:
+                        self._clock = float(self._times[stop])
+                    continue
+                self._advance(stop)
+            self.chart._wait_for_page()
+
+    def _advance(self, stop: int):
+        rows = self._source.iloc[self._position:stop]
+        self._position = stop
+        if self.ticks:
+            self.chart.update_from_ticks(rows, self.cumulative_volume)
+        else:
+            self.chart._update_bars(rows)
+        shown = int(np.searchsorted(self._marker_times, self._times[stop - 1], side='right'))
+        if shown > self._shown_markers:
+            self._marker_ids += self.chart.marker_list(self._markers[self._shown_markers:shown])
+            self._shown_markers = shown
+        if self.on_frame:
+            self.on_frame(self.chart, float(self._times[stop - 1]))
+        if stop == len(self._times):
+            self._done.set()
+
+    def _seek_to(self, seconds: float):
+        position = max(int(np.searchsorted(self._times, seconds, side='left')), 0 if self.ticks else 1)
+        if self.ticks:
+            self.chart.set(self._base)
+            if position:
+                self.chart.update_from_ticks(self._source.iloc[:position], self.cumulative_volume)
+        else:
+            self.chart.set(self._source.iloc[:position])
+        self._position = position
+        if position < len(self._times):
+            self._done.clear()
+        self._clock = max(seconds, float(self._times[position - 1])) if position else seconds
+        if self._marker_ids:
+            self.chart.remove_markers(self._marker_ids)
+        shown = int(np.searchsorted(self._marker_times, self._clock, side='right'))
+        self._marker_ids = self.chart.marker_list(self._markers[:shown])
+        self._shown_markers = shown
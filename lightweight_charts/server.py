@@ -0,0 +1,74 @@
+from .transport import WebSocketTransport, _Client
+
+_EVALUATE, _PIN = '__evaluate__', '__pin__'
+
+
+class ChartServer(WebSocketTransport):
+    """
+    Serves one chart to any number of browsers.\n
+    As in `WebSocketTransport`, the state of the chart is kept in a `StateLog`, so a page that
+    connects gets a compact snapshot, then the live updates.\n
+    Each page has its own send queue. While a page is busy, superseded scripts in its queue are
+    dropped; a page that still falls more than `max_backlog` scripts behind is reloaded, and
+    catches up from a fresh snapshot.\n
+        server = ChartServer(port=8000)
+        chart = Chart(transport=server)
+        chart.set(df)
+        chart.show(block=True)
+    """
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, max_backlog: int = 1000, open_browser: bool = False):
+        self.max_backlog = max_backlog
+        self.reloads = 0
+        super().__init__(host, port, open_browser)
+
+    @property
+    def viewers(self) -> int:
+        return len(self._clients)
+
+    def load(self, timeout: float = None) -> bool:
+        # The chart is live as soon as it is shown; pages join whenever they connect.
+        if self.open_browser:
+            super().load(0)
+        return True
+
+    def pin(self, target: str):
+        with self._lock:
+            for client in self._clients:
+                client.pending.append(('', (_PIN, target)))
+
+    def _take(self, client: _Client) -> list:
+        items = self._coalesce(list(client.pending))
+        client.pending.clear()
+        if len(items) > self.max_backlog:
+            self.reloads += 1
+            return [('location.reload()', None)] + [item for item in items if item[1] and item[1][0] == _EVALUATE]
+        return items
+
+    @staticmethod
+    def _coalesce(items: list) -> list:
+        """
+        Drops the scripts superseded later in a page's queue, walking it backwards: keyed scripts
+        by a later script with the same key, updates by a later `setData` of their series. A pin
+        keeps everything queued before it for the script that reads the state.
+        """
+        kept, superseded, data_set = [], set(), set()
+        for script, key in reversed(items):
+            if key is None:
+                kept.append((script, key))
+                continue
+            operation = key[0]
+            if operation == _PIN:
+                superseded = {k for k in superseded if key[1] not in k[1:]}
+                data_set.discard(key[1])
+            elif operation == 'update':
+                if key[1] not in data_set:
+                    kept.append((script, key))
+            elif operation in (_EVALUATE, 'markers'):
+                kept.append((script, key))
+            elif key not in superseded:
+                superseded.add(key)
+                if operation == 'data':
+                    data_set.update(key[1:])
+                kept.append((script, key))
+        kept.reverse()
+        return kept
@@ -0,0 +1,201 @@
+import importlib
+import json
+
+import numpy as np
+import pandas as pd
+
+from . import timecodec
+from .util import Pane, StateLog
+
+FORMAT_VERSION = 1
+
+# Objects saved with their attributes, besides panes, frames and plain values.
+_VALUE_TYPES = (timecodec.Cadence,)
+# Datasets stored by `load_dataset` live in the page, which a snapshot does not keep.
+_SKIPPED = frozenset(('win', 'run_script', 'id', '_datasets', '_dataset_ids'))
+
+
+class _Unsaved(Exception):
+    pass
+
+
+class _Encoder:
+    """
+    Turns pane attributes into JSON, moving DataFrame columns into numpy arrays.\n
+    Values that cannot be saved (callbacks, transports, events...) raise `_Unsaved`,
+    and the attribute holding them is left out.
+    """
+    def __init__(self):
+        self.arrays = {}
+
+    def array(self, values: np.ndarray) -> str:
+        name = f'a{len(self.arrays)}'
+        self.arrays[name] = values
+        return name
+
+    def column(self, values: np.ndarray) -> str:
+        if values.dtype == object:
+            # Columns mixing the rows appended by `update`; integral ones (times) stay integers.
+            try:
+                values = values.astype('float64')
+            except (TypeError, ValueError):
+                values = values.astype(str)
+            else:
+                if np.isfinite(values).all() and (values == np.round(values)).all():
+                    values = values.astype('int64')
+        return self.array(values)
+
+    def encode(self, value):
+        if value is None or isinstance(value, (bool, int, float, str)):
+            return value
+        if isinstance(value, np.generic):
+            return value.item()
+        if isinstance(value, Pane):
+            return {'$pane': value.id}
+        if isinstance(value, pd.DataFrame):
+            return {'$frame': {
+                'columns': [self.encode(col) for col in value.columns],
+                'arrays': [self.column(value[col].to_numpy()) for col in value.columns],
+                'index': self.column(value.index.to_numpy()),
+            }}
+        if isinstance(value, pd.Series):
+            return {'$series': {
+                'index': [self.encode(label) for label in value.index],
+                'values': [self.encode(item) for item in value.tolist()],
+                'name': self.encode(value.name),
+            }}
+        if isinstance(value, tuple):
+            return {'$tuple': [self.encode(item) for item in value]}
+        if isinstance(value, list):
+            return [self.encode(item) for item in value]
+        if isinstance(value, dict):
+            return {'$dict': [[self.encode(k), self.encode(v)] for k, v in value.items()]}
+        if isinstance(value, _VALUE_TYPES):
+            return {'$object': _class_path(type(value)), 'attrs': self.encode(vars(value))}
+        raise _Unsaved
+
+    def attributes(self, pane: Pane) -> dict:
+        attrs = {}
+        for name, value in vars(pane).items():
+            if name in _SKIPPED:
+                continue
+            try:
+                attrs[name] = self.encode(value)
+            except _Unsaved:
+                pass
+        return attrs
+
+
+class _Decoder:
+    def __init__(self, archive, panes: dict):
+        self.archive = archive
+        self.panes = panes
+
+    def decode(self, value):
+        if isinstance(value, list):
+            return [self.decode(item) for item in value]
+        if not isinstance(value, dict):
+            return value
+        if '$pane' in value:
+            return self.panes.get(value['$pane'])
+        if '$frame' in value:
+            frame = value['$frame']
+            columns = [self.decode(col) for col in frame['columns']]
+            return pd.DataFrame(
+                {col: self.archive[name] for col, name in zip(columns, frame['arrays'])},
+                index=self.archive[frame['index']], columns=columns,
+            )
+        if '$series' in value:
+            series = value['$series']
+            return pd.Series(
+                self.decode(series['values']), index=self.decode(series['index']), name=self.decode(series['name']),
+            )
+        if '$tuple' in value:
+            return tuple(self.decode(item) for item in value['$tuple'])
+        if '$dict' in value:
+            return {self.decode(k): self.decode(v) for k, v in value['$dict']}
+        if '$object' in value:
+            cls = _load_class(value['$object'])
+            obj = cls.__new__(cls)
+            vars(obj).update(self.decode(value['attrs']))
+            return obj
+        return {k: self.decode(v) for k, v in value.items()}
+
+
+def _class_path(cls) -> str:
+    return f'{cls.__module__}:{cls.__qualname__}'
+
+
+def _load_class(path: str):
+    module, name = path.split(':')
+    if not module.startswith('lightweight_charts'):
+        raise ValueError(f'Snapshots only restore lightweight_charts objects, not "{path}".')
+    return getattr(importlib.import_module(module), name)
+
+
+def save(chart, path: str) -> str:
+    """
+    Writes the state of a chart's window to `path`, as a compressed numpy archive.\n
+    Series data is stored column by column; styling, lines, spans and widgets are stored as
+    the compacted scripts that built them, and the panes as their plain attributes.
+    :return: the path written.
+    """
+    window = chart.win
+    encoder = _Encoder()
+    panes = [
+        {'id': pane.id, 'class': _class_path(type(pane)), 'attrs': encoder.attributes(pane)}
+        for pane in window.registry.panes()
+    ]
+    meta = {
+        'version': FORMAT_VERSION,
+        'root': chart.id,
+        'panes': panes,
+        'log': [[script, key] for script, key in window.state.items() if not key or key[0] != 'callback'],
+        'markers': sorted(window.state.marker_targets),
+    }
+    meta = np.frombuffer(json.dumps(meta, separators=(',', ':')).encode(), dtype=np.uint8)
+    with open(path, 'wb') as f:
+        np.savez_compressed(f, meta=meta, **encoder.arrays)
+    return path
+
+
+def load(path: str, window, root: Pane = None):
+    """
+    Rebuilds the panes saved by `save` in `window`, queueing the state of the page as one script.\n
+    :param root: the instance to restore the saved chart into; an `AbstractChart` is made if omitted.
+    :return: the restored chart.
+    """
+    from .abstract import AbstractChart
+    with np.load(path, allow_pickle=False) as archive:
+        meta = json.loads(archive['meta'].tobytes())
+        if meta['version'] != FORMAT_VERSION:
+            raise ValueError(f'"{path}" is not a snapshot of format version {FORMAT_VERSION}.')
+        panes = {}
+        for entry in meta['panes']:
+            if entry['id'] == meta['root']:
+                pane = root if root is not None else AbstractChart.__new__(AbstractChart)
+            else:
+                cls = _load_class(entry['class'])
+                pane = cls.__new__(cls)
+            pane.win, pane.run_script, pane.id = window, window.run_script, entry['id']
+            window._id_gen.add(pane.id[7:])
+            window.registry.track(pane)
+            panes[pane.id] = pane
+        decoder = _Decoder(archive, panes)
+        for entry in meta['panes']:
+            pane = panes[entry['id']]
+            for name, value in entry['attrs'].items():
+                setattr(pane, name, decoder.decode(value))
+    for pane in panes.values():
+        if hasattr(pane, '_restored'):
+            pane._restored()
+    # Keeps the restored panes at hand by id, since nothing else refers to them yet.
+    window.restored.update(panes)
+
+    state = StateLog()
+    state.extend(meta['log'])
+    state.marker_targets.update(meta['markers'])
+    window.run_script('\n'.join(state.scripts(window.registry)), record=False)
+    window.state.extend(state.items())
+    window.state.marker_targets.update(state.marker_targets)
+    return panes[meta['root']]
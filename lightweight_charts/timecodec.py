@@ -0,0 +1,210 @@
+from datetime import datetime, date
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+_EPOCH = datetime(1970, 1, 1)
+
+# Integer and float epochs are interpreted by magnitude: anything below 1e11 is
+# seconds (up to the year 5138), then milliseconds, microseconds and nanoseconds.
+_UNIT_BOUNDS = ((1e11, 1), (1e14, 10 ** 3), (1e17, 10 ** 6))
+_NS_PER_UNIT = {1: 10 ** 9, 10 ** 3: 10 ** 6, 10 ** 6: 10 ** 3, 10 ** 9: 1}
+
+
+def _epoch_divisor(magnitude: float) -> int:
+    for bound, divisor in _UNIT_BOUNDS:
+        if magnitude < bound:
+            return divisor
+    return 10 ** 9
+
+
+def _number_seconds(value) -> float:
+    return value / _epoch_divisor(abs(value))
+
+
+def _datetime_seconds(value: datetime) -> float:
+    if value.tzinfo is None:
+        return (value - _EPOCH).total_seconds()
+    return value.timestamp()
+
+
+@lru_cache(maxsize=4096)
+def _string_seconds(value: str) -> float:
+    try:
+        return _datetime_seconds(datetime.fromisoformat(value))
+    except ValueError:
+        if value.lstrip('-').isdigit():
+            return _number_seconds(int(value))
+        return pd.Timestamp(value).timestamp()
+
+
+def to_seconds(value) -> float:
+    """
+    Converts a single time value to epoch seconds.\n
+    Accepts epoch numbers (s/ms/us/ns), datetime, pd.Timestamp, np.datetime64, date and strings.
+    Naive times are treated as UTC.
+    """
+    cls = type(value)
+    if cls is int or cls is float:
+        return _number_seconds(value)
+    if cls is pd.Timestamp:
+        return value.timestamp()
+    if cls is str:
+        return _string_seconds(value)
+    if isinstance(value, datetime):
+        return _datetime_seconds(value)
+    if isinstance(value, np.datetime64):
+        return value.astype('datetime64[ns]').astype(np.int64) / 10 ** 9
+    if isinstance(value, (np.integer, np.floating)):
+        return _number_seconds(value.item())
+    if isinstance(value, date):
+        return (datetime(value.year, value.month, value.day) - _EPOCH).total_seconds()
+    return pd.Timestamp(value).timestamp()
+
+
+def floor(seconds: float, interval: float, offset: float = 0) -> float:
+    """
+    Snaps epoch seconds onto the bar grid described by `interval` and `offset`.
+    """
+    return interval * (seconds // interval) + offset
+
+
+def to_nanoseconds_array(values) -> np.ndarray:
+    """
+    Vectorized conversion of a column of time values to int64 epoch nanoseconds.
+    """
+    if isinstance(getattr(values, 'dtype', None), pd.DatetimeTZDtype):
+        values = pd.DatetimeIndex(values).tz_convert(None)
+    arr = np.asarray(values)
+    kind = arr.dtype.kind
+    if kind == 'M':
+        return arr.astype('datetime64[ns]').view(np.int64)
+    if kind in 'iuf':
+        if arr.size == 0:
+            return arr.astype(np.int64)
+        if kind == 'f' and np.isnan(arr).any():
+            # NaN has no integer value; the cast would turn it into an arbitrary time.
+            raise ValueError('Time values must not be NaN; drop the rows without a time first.')
+        scale = _NS_PER_UNIT[_epoch_divisor(float(np.max(np.abs(arr))))]
+        return (arr * scale).astype(np.int64) if kind == 'f' else arr.astype(np.int64) * scale
+    return to_nanoseconds_array(pd.to_datetime(arr, utc=True))
+
+
+def to_seconds_array(values) -> np.ndarray:
+    """
+    Vectorized conversion of a column of time values to int64 epoch seconds.
+    """
+    return to_nanoseconds_array(values) // 10 ** 9
+
+
+def floor_array(seconds: np.ndarray, interval: float, offset: float = 0) -> np.ndarray:
+    return interval * (seconds // interval) + offset
+
+
+
+# Frames longer than this are inferred from evenly spaced blocks of rows, then verified.
+SAMPLE_THRESHOLD = 65536
+_SAMPLE_BLOCKS = 256
+_SAMPLE_BLOCK_SIZE = 64
+
+
+def _mode(values: np.ndarray):
+    uniques, counts = np.unique(values, return_counts=True)
+    return uniques[np.argmax(counts)]
+
+
+def _is_majority(values: np.ndarray, candidate) -> bool:
+    return np.count_nonzero(values == candidate) * 2 > values.size
+
+
+def _sample(ns: np.ndarray) -> np.ndarray:
+    starts = np.linspace(0, ns.size - _SAMPLE_BLOCK_SIZE, _SAMPLE_BLOCKS).astype(np.int64)
+    return (starts[:, None] + np.arange(_SAMPLE_BLOCK_SIZE)).ravel()
+
+
+def _time_components(ns: np.ndarray):
+    # (seconds per unit, values) for microseconds, seconds, minutes, hours and day of month.
+    seconds = ns // 10 ** 9
+    days = ns.astype('datetime64[ns]').astype('datetime64[D]')
+    return (
+        (1e-6, (ns // 1000) % 1_000_000),
+        (1, seconds % 60),
+        (60, (seconds // 60) % 60),
+        (3600, (seconds // 3600) % 24),
+        (86400, (days - days.astype('datetime64[M]')).astype(np.int64) + 1),
+    )
+
+
+def _offset(ns: np.ndarray, interval: float) -> float:
+    for unit, values in _time_components(ns):
+        value = _mode(values) * unit
+        if value == 0:
+            continue
+        return 0 if value >= interval else float(value)
+    return 0
+
+
+def infer_interval(ns: np.ndarray):
+    """
+    Infers the bar interval and offset (both in seconds) from sorted int64 epoch nanoseconds.\n
+    Large arrays are inferred from a sample; the sampled interval is kept only if it is
+    the interval between a majority of all rows, otherwise the full array is used.
+    :return: (interval, offset), or None if there are fewer than two rows.
+    """
+    if ns.size < 2:
+        return None
+    diffs = np.diff(ns)
+    if ns.size > SAMPLE_THRESHOLD:
+        sample = ns[_sample(ns)]
+        interval_ns = _mode(np.diff(sample.reshape(_SAMPLE_BLOCKS, _SAMPLE_BLOCK_SIZE)).ravel())
+        if not _is_majority(diffs, interval_ns):
+            interval_ns = _mode(diffs)
+            sample = ns
+    else:
+        interval_ns = _mode(diffs)
+        sample = ns
+    interval = float(interval_ns) / 10 ** 9
+    return interval, _offset(sample, interval)
+
+
+class Cadence:
+    """
+    The interval and offset of a series, cached so that data continuing the same
+    cadence does not have to be inferred again.
+    """
+    _EDGE = 32
+
+    def __init__(self, interval: float, offset: float, ns: np.ndarray):
+        self.interval = interval
+        self.offset = offset
+        self._interval_ns = int(round(interval * 10 ** 9))
+        self._phase = int(ns[0]) % self._interval_ns if self._interval_ns else None
+
+    @classmethod
+    def infer(cls, ns: np.ndarray, previous: 'Cadence' = None) -> 'Cadence':
+        if previous is not None and previous.continues(ns):
+            return previous
+        inferred = infer_interval(ns)
+        return cls(*inferred, ns) if inferred else None
+
+    @classmethod
+    def from_hint(cls, interval, ns: np.ndarray) -> 'Cadence':
+        """
+        Builds a cadence from a known interval (seconds, pd.Timedelta or a string such as '1h'),
+        aligned to the first row.
+        """
+        if not isinstance(interval, (int, float)):
+            interval = pd.Timedelta(interval).total_seconds()
+        offset = (int(ns[0]) % int(round(interval * 10 ** 9))) / 10 ** 9 if ns.size else 0
+        return cls(float(interval), offset, ns[:1] if ns.size else np.zeros(1, np.int64))
+
+    def continues(self, ns: np.ndarray) -> bool:
+        if not self._interval_ns or ns.size < 2:
+            return False
+        edges = np.concatenate((np.diff(ns[:self._EDGE]), np.diff(ns[-self._EDGE:])))
+        if not (edges == self._interval_ns).all():
+            return False
+        if int(ns[0]) % self._interval_ns != self._phase or int(ns[-1]) % self._interval_ns != self._phase:
+            return False
+        return _is_majority(np.diff(ns), self._interval_ns)
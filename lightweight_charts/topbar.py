@@ -11,16 +11,30 @@ class Widget(Pane):
     def __init__(self, topbar, value, func=None):
         super().__init__(topbar.win)
         self.value = value
+        self.func = func
+        self._chart = topbar._chart
+        self._bind()
 
+    def _bind(self):
         def wrapper(v):
-            self.value = v
-            func(topbar._chart)
+            self._changed(v)
+            if self.func:
+                self.func(self._chart)
 
         async def async_wrapper(v):
-            self.value = v
-            await func(topbar._chart)
+            self._changed(v)
+            await self.func(self._chart)
 
-        self.win.handlers[self.id] = async_wrapper if asyncio.iscoroutinefunction(func) else wrapper
+        self.win.registry.add_handler(
+            self.id, self.id, async_wrapper if asyncio.iscoroutinefunction(self.func) else wrapper)
+
+    def _changed(self, value):
+        self.value = value
+
+    def _restored(self):
+        # Callbacks are not saved in snapshots; assign `func` again to handle the widget.
+        self.func = None
+        self._bind()
 
 
 class TextWidget(Widget):
@@ -30,7 +44,7 @@ class TextWidget(Widget):
 
     def set(self, string):
         self.value = string
-        self.run_script(f'{self.id}.innerText = "{string}"')
+        self.run_script(f'{self.id}.innerText = "{string}"', key=('text', self.id))
 
 
 class SwitcherWidget(Widget):
@@ -42,9 +56,14 @@ class SwitcherWidget(Widget):
     def set(self, option):
         if option not in self.options:
             raise ValueError(f"option '{option}' does not exist within {self.options}.")
-        self.run_script(f'{self.id}.onItemClicked("{option}")')
+        self.run_script(f'{self.id}.onItemClicked("{option}")', key=('value', self.id))
         self.value = option
 
+    def _changed(self, value):
+        self.value = value
+        # The page already shows the option clicked; the state log selects it on restore.
+        self.win.record(f'{self.id}.select("{value}")', ('value', self.id))
+
 
 class MenuWidget(Widget):
     def __init__(self, topbar, options, default, separator, align, func):
@@ -62,7 +81,7 @@ class ButtonWidget(Widget):
 
     def set(self, string):
         self.value = string
-        self.run_script(f'{self.id}.elem.innerText = "{string}"')
+        self.run_script(f'{self.id}.elem.innerText = "{string}"', key=('text', self.id))
 
 
 class TopBar(Pane):
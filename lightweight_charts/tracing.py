@@ -0,0 +1,134 @@
+import math
+import threading
+import time
+from itertools import count
+
+# Prefix of a traced message on its way to the webview process: PREFIX + seq + '_~_' + script.
+PREFIX = '_~_~TRACE~_~_'
+HANDLER = '__trace__'
+
+# Consecutive stamps of a message, and the stage each pair of stamps measures.
+STAMPS = ('enqueued', 'dequeued', 'evaluated', 'rendered')
+STAGES = {
+    'queue': ('enqueued', 'dequeued'),
+    'evaluate': ('dequeued', 'evaluated'),
+    'render': ('evaluated', 'rendered'),
+    'total': ('enqueued', 'rendered'),
+}
+
+
+class LatencyHistogram:
+    """
+    A log-bucketed histogram of latencies in seconds.\n
+    Buckets grow by 2**(1/8) (about 9%) from one microsecond, so recording is O(1),
+    memory is bounded and percentiles are accurate to within a bucket.
+    """
+    _MIN = 1e-6
+    _GROWTH = 2 ** (1 / 8)
+    _BUCKETS = 256
+
+    def __init__(self):
+        self._counts = [0] * self._BUCKETS
+        self.count = 0
+        self.max = 0.0
+
+    def record(self, seconds: float):
+        if seconds <= self._MIN:
+            index = 0
+        else:
+            index = min(int(math.log(seconds / self._MIN, self._GROWTH)) + 1, self._BUCKETS - 1)
+        self._counts[index] += 1
+        self.count += 1
+        self.max = max(self.max, seconds)
+
+    def percentile(self, q: float) -> float:
+        """
+        :param q: the percentile, between 0 and 100.
+        :return: the upper bound of the bucket holding the percentile, or None if nothing was recorded.
+        """
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(self.count * q / 100))
+        seen = 0
+        for index, n in enumerate(self._counts):
+            seen += n
+            if seen >= rank:
+                return min(self._MIN * self._GROWTH ** index, self.max)
+
+    def summary(self) -> dict:
+        return {'count': self.count, 'p50': self.percentile(50), 'p99': self.percentile(99), 'max': self.max}
+
+
+class Tracer:
+    """
+    Follows scripts from `Window.run_script` to the frame that draws them.\n
+    Each traced message is stamped when it is enqueued, when the webview process dequeues it,
+    when `evaluate_js` returns and when the next animation frame runs. Stamps are plain
+    `time.time()` values, so they are comparable across the two processes.
+    """
+    MAX_OPEN = 4096
+
+    def __init__(self):
+        self._seq = count()
+        self._lock = threading.Lock()
+        self._open = {}
+        self.histograms = {stage: LatencyHistogram() for stage in STAGES}
+
+    def wrap(self, script: str) -> str:
+        """
+        Stamps a script as enqueued and returns the traced message to put on the queue.
+        """
+        seq = next(self._seq)
+        with self._lock:
+            if len(self._open) >= self.MAX_OPEN:
+                # Messages whose acknowledgement never arrived, e.g. because the script raised.
+                del self._open[next(iter(self._open))]
+            self._open[seq] = {'enqueued': time.time()}
+        return f'{PREFIX}{seq}_~_{script}\ntraceAck({seq})'
+
+    def on_stamps(self, seq, *pairs):
+        """
+        Handler for the stamps reported by the webview process and the page, as stage;;;time pairs.
+        """
+        with self._lock:
+            stamps = self._open.get(int(seq))
+            if stamps is None:
+                return
+            for name, value in zip(pairs[::2], pairs[1::2]):
+                stamps[name] = float(value)
+            for stage, (start, end) in STAGES.items():
+                if start in stamps and end in stamps and stage not in stamps:
+                    self.histograms[stage].record(max(0.0, stamps[end] - stamps[start]))
+                    stamps[stage] = True
+            if all(stage in stamps for stage in STAGES):
+                del self._open[int(seq)]
+
+    def summary(self) -> dict:
+        """
+        :return: stage -> {count, p50, p99, max}, in seconds.
+        """
+        with self._lock:
+            return {stage: histogram.summary() for stage, histogram in self.histograms.items()}
+
+    def reset(self):
+        with self._lock:
+            self._open.clear()
+            self.histograms = {stage: LatencyHistogram() for stage in STAGES}
+
+
+def unwrap(message: str):
+    """
+    :return: (seq, script) for a traced message, or (None, message).
+    """
+    if not message.startswith(PREFIX):
+        return None, message
+    seq, script = message[len(PREFIX):].split('_~_', 1)
+    return seq, script
+
+
+def stamp_message(seq, **stamps) -> str:
+    """
+    The event message reporting stamps taken in the webview process.
+    """
+    pairs = ';;;'.join(f'{name};;;{value}' for name, value in stamps.items())
+    return f'{HANDLER}_~_{seq};;;{pairs}'
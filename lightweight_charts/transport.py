@@ -0,0 +1,778 @@
+import asyncio
+import base64
+import concurrent.futures
+import hashlib
+import json
+import multiprocessing as mp
+import queue
+import re
+import threading
+import time
+import webbrowser
+from collections import deque
+from itertools import count
+from typing import Optional
+from urllib.parse import urlsplit
+
+try:
+    import webview
+except ImportError:
+    webview = None
+
+from . import tracing
+from .util import StateLog
+
+
+class Transport:
+    """
+    Carries scripts from a `Window` to a page rendering `TEMPLATE`, and events back.\n
+    `js_api_code` is the JS expression the page uses as `window.callbackFunction`.
+    """
+    js_api_code: str = None
+    # Whether the transport understands messages wrapped by `tracing.Tracer`.
+    supports_tracing = False
+
+    def attach(self, window):
+        """
+        Called by the `Window` sending through this transport.
+        """
+
+    def send(self, script: str, key: tuple = None):
+        """
+        :param key: the `run_script` key of the script, (operation, target, ...), if it has one.
+        """
+        raise NotImplementedError
+
+    def send_batch(self, scripts: list, keys: list = None):
+        self.send('\n'.join(scripts))
+
+    def pin(self, target: str):
+        """
+        Called as a script reading the state of `target` is about to be sent; see `ScriptBuffer.pin`.
+        """
+
+    def evaluate(self, script: str):
+        """
+        Evaluates a JS expression and returns its (JSON compatible) result.
+        """
+        raise NotImplementedError
+
+    def next_event(self) -> Optional[str]:
+        """
+        :return: the next event message sent through `window.callbackFunction`, or None.
+        """
+        raise NotImplementedError
+
+    def load(self, timeout: float = None) -> bool:
+        """
+        Waits until the page is ready to evaluate scripts.\n
+        :return: False if it was not ready within `timeout` seconds.
+        """
+        return True
+
+    def closed(self) -> bool:
+        """
+        :return: True once the page has been closed and the chart should exit.
+        """
+        return False
+
+    def show(self):
+        pass
+
+    def hide(self):
+        pass
+
+    def close(self):
+        pass
+
+    def queues(self) -> dict:
+        """
+        :return: name -> queue, for the queue depths reported by `Window.stats`.
+        """
+        return {}
+
+
+# The acknowledgements of `AsyncChart`, answered by the in-process stand-ins for a page.
+ACKNOWLEDGE = re.compile(r'^acknowledge\("([^"]+)", (\d+)\)$', re.MULTILINE)
+
+
+class CallbackAPI:
+    def __init__(self, emit_queue):
+        self.emit_q = emit_queue
+
+    def callback(self, message: str):
+        self.emit_q.put(message)
+
+
+class PyWV:
+    stop_on_exit = False
+
+    def __init__(self, q, start_ev, exit_ev, loaded, emit_queue, return_queue, html, debug,
+                 width, height, x, y, screen, on_top, maximize, title, closed=None):
+        """
+        :param closed: one event per window, given when the process is resident: closing a window
+        then only hides it and sets its event, so the window can be reset and reused.
+        """
+        self.queue = q
+        self.return_queue = return_queue
+        self.exit = exit_ev
+        self.callback_api = CallbackAPI(emit_queue)
+        self.loaded: list = loaded
+        self.closed = closed
+        self.html = html
+        self._looping = False
+
+        self.windows = []
+        # A resident process starts ahead of its first chart, with that chart's window hidden.
+        self.create_window(width, height, x, y, screen, on_top, maximize, title, hidden=closed is not None)
+
+        start_ev.wait()
+        # 优化：减少webview启动延迟
+        webview.start(debug=debug, http_server=True)
+        self.exit.set()
+
+    def create_window(self, width, height, x, y, screen=None, on_top=False, maximize=False, title='', hidden=False):
+        screen = webview.screens[screen] if screen is not None else None
+        if maximize:
+            if screen is None:
+                active_screen = webview.screens[0]
+                width, height = active_screen.width, active_screen.height
+            else:
+                width, height = screen.width, screen.height
+        self.windows.append(webview.create_window(
+            title, html=self.html, js_api=self.callback_api,
+            width=width, height=height, x=x, y=y, screen=screen,
+            on_top=on_top,  background_color='#000000', hidden=hidden))
+        i = len(self.windows) - 1
+        self.windows[i].events.loaded += lambda: self.on_loaded(i)
+        if self.closed is not None:
+            self.windows[i].events.closing += lambda: self.on_closing(i)
+
+    def on_loaded(self, i):
+        self.loaded[i].set()
+        # Every window is served by the loop of the first one loaded, which keeps scripts in order.
+        if not self._looping:
+            self._looping = True
+            self.loop()
+
+    def on_closing(self, i):
+        self.windows[i].hide()
+        self.closed[i].set()
+        return False
+
+    def configure(self, i, width, height, x, y, title, on_top, maximize):
+        window = self.windows[i]
+        window.resize(width, height)
+        if x is not None and y is not None:
+            window.move(x, y)
+        window.set_title(title)
+        window.on_top = on_top
+        if maximize:
+            window.maximize()
+
+    def reset(self, i):
+        self.windows[i].hide()
+        self.windows[i].load_html(self.html)
+
+    def loop(self):
+        while 1:
+            i, arg = self.queue.get()
+            if i == 'create_window':
+                self.create_window(*arg)
+            elif i == 'configure':
+                self.configure(*arg)
+            elif arg in ('show', 'hide'):
+                getattr(self.windows[i], arg)()
+            elif arg == 'reset':
+                self.reset(i)
+            elif arg == 'exit':
+                self.exit.set()
+                if self.stop_on_exit:
+                    return
+            else:
+                seq, arg = tracing.unwrap(arg)
+                dequeued = time.time() if seq is not None else None
+                try:
+                    if '_~_~RETURN~_~_' in arg:
+                        self.return_queue.put(self.windows[i].evaluate_js(arg[14:]))
+                    else:
+                        self.windows[i].evaluate_js(arg)
+                except KeyError:
+                    return
+                if seq is not None:
+                    self.callback_api.callback(
+                        tracing.stamp_message(seq, dequeued=dequeued, evaluated=time.time()))
+
+
+class StubWindow:
+    """
+    Stands in for a webview window: scripts are not evaluated, and traced scripts are
+    acknowledged on the next simulated animation frame.
+    """
+    _ACK = re.compile(r'traceAck\((\d+)\)$')
+
+    def __init__(self, stub):
+        self._stub = stub
+
+    def evaluate_js(self, script):
+        if 'acknowledge(' in script:
+            for name, seq in ACKNOWLEDGE.findall(script):
+                self._stub.callback_api.callback(f'{name}_~_{seq}')
+        match = self._ACK.search(script)
+        if match:
+            self._stub.request_frame(match.group(1))
+
+    def show(self):
+        pass
+
+    def hide(self):
+        pass
+
+
+class StubPyWV(PyWV):
+    """
+    An in-process, GUI-less stand-in for the webview process, driven through the same queues.\n
+    Used to measure queueing, serialization and tracing overhead where no display is available.
+    """
+    stop_on_exit = True
+    FRAME = 1 / 60
+
+    def __init__(self, q, start_ev, exit_ev, loaded, emit_queue, return_queue, html, debug,
+                 width, height, x, y, screen, on_top, maximize, title, closed=None):
+        self.queue = q
+        self.return_queue = return_queue
+        self.exit = exit_ev
+        self.callback_api = CallbackAPI(emit_queue)
+        self.loaded: list = loaded
+        self.closed = closed
+        self.windows = []
+        self._frame_requests = []
+        self._frame_lock = threading.Lock()
+
+        self.windows.append(StubWindow(self))
+        start_ev.wait()
+        threading.Thread(target=self._frames, daemon=True).start()
+        self.loaded[0].set()
+        self.loop()
+
+    def create_window(self, *_):
+        self.windows.append(StubWindow(self))
+        self.loaded[len(self.windows)-1].set()
+
+    def configure(self, *_):
+        pass
+
+    def reset(self, i):
+        self.loaded[i].set()
+
+    def request_frame(self, seq):
+        with self._frame_lock:
+            self._frame_requests.append(seq)
+
+    def _frames(self):
+        while not self.exit.is_set():
+            time.sleep(self.FRAME - time.time() % self.FRAME)
+            with self._frame_lock:
+                requests, self._frame_requests = self._frame_requests, []
+            rendered = time.time()
+            for seq in requests:
+                self.callback_api.callback(tracing.stamp_message(seq, rendered=rendered))
+
+
+class _StubProcess(threading.Thread):
+    def terminate(self):
+        pass
+
+
+class PyWebviewTransport(Transport):
+    """
+    Renders the chart in a pywebview window. Every window of a session is hosted by one
+    webview process, fed through shared multiprocessing queues.\n
+    By default the process is spawned with the first chart and terminated when a chart exits.
+    After `start`, it stays resident: closing a chart only resets its window, which the next
+    chart reuses, until `stop`.\n
+    :param stub: hosts the windows in an in-process `StubPyWV` instead, which queues and
+    acknowledges scripts without rendering them.
+    """
+    js_api_code = 'pywebview.api.callback'
+    supports_tracing = True
+    MAX_WINDOWS = 10
+    _window_num = 0
+    _process = None
+    _resident = False
+    _free = []
+    _exit, _start = (mp.Event() for _ in range(2))
+    _q, _emit_q, _return_q = (mp.Queue() for _ in range(3))
+    _loaded_list = [mp.Event() for _ in range(MAX_WINDOWS)]
+    _closed_list = [mp.Event() for _ in range(MAX_WINDOWS)]
+    # Results come back in request order on the shared `_return_q`, so one request is in flight at a time.
+    _evaluate_lock = threading.Lock()
+
+    def __init__(self, width: int = 800, height: int = 600, x: int = None, y: int = None, title: str = '',
+                 screen: int = None, on_top: bool = False, maximize: bool = False, debug: bool = False,
+                 stub: bool = False):
+        cls = PyWebviewTransport
+        self._reused = bool(cls._resident and cls._free)
+        self._is_loaded = False
+        self._is_closed = False
+        if self._reused:
+            # The screen of a reused window cannot be changed.
+            self._i = cls._free.pop(0)
+            cls._q.put(('configure', (self._i, width, height, x, y, title, on_top, maximize)))
+        else:
+            self._i = cls._window_num
+            cls._window_num += 1
+            if self._i == 0:
+                cls._spawn(stub, debug, width, height, x, y, screen, on_top, maximize, title)
+            else:
+                cls._q.put(('create_window', (width, height, x, y, screen, on_top, maximize, title)))
+        self._loaded = cls._loaded_list[self._i]
+
+    @classmethod
+    def _spawn(cls, stub: bool, debug: bool, *window_options):
+        from .abstract import TEMPLATE
+        process = _StubProcess if stub else mp.Process
+        cls._process = process(target=StubPyWV if stub else PyWV, args=(
+            cls._q, cls._start, cls._exit, cls._loaded_list,
+            cls._emit_q, cls._return_q, TEMPLATE, debug,
+            *window_options, cls._closed_list if cls._resident else None
+        ), daemon=True)
+        cls._process.start()
+
+    @classmethod
+    def start(cls, debug: bool = False, stub: bool = False):
+        """
+        Starts the webview process ahead of the first chart, and keeps it running across
+        `Chart.exit` until `stop` is called.
+        """
+        if cls._process is not None:
+            if cls._resident:
+                return
+            raise RuntimeError('The webview process is already running; start it before creating charts.')
+        cls._resident = True
+        cls._spawn(stub, debug, 800, 600, None, None, None, False, False, '')
+        cls._window_num, cls._free = 1, [0]
+        cls._start.set()
+
+    @classmethod
+    def stop(cls, timeout: float = 5):
+        """
+        Closes every window and terminates the webview process.
+        """
+        if cls._process is None:
+            return
+        cls._q.put((0, 'exit'))
+        if cls._start.is_set():
+            cls._exit.wait(timeout)
+        cls._process.terminate()
+        cls._reset()
+
+    @classmethod
+    def _reset(cls):
+        cls._process = None
+        cls._window_num = 0
+        cls._resident = False
+        cls._free = []
+        # Fresh queues and cleared events, so nothing of this session reaches the next one.
+        cls._q, cls._emit_q, cls._return_q = (mp.Queue() for _ in range(3))
+        for event in (cls._exit, cls._start, *cls._loaded_list, *cls._closed_list):
+            event.clear()
+
+    def send(self, script: str, key: tuple = None):
+        self._q.put((self._i, script))
+
+    def evaluate(self, script: str):
+        with PyWebviewTransport._evaluate_lock:
+            self._q.put((self._i, f'_~_~RETURN~_~_{script}'))
+            return self._return_q.get()
+
+    def next_event(self) -> Optional[str]:
+        return None if self._emit_q.empty() else self._emit_q.get()
+
+    def load(self, timeout: float = None) -> bool:
+        self._start.set()
+        self._is_loaded = True
+        loaded = self._loaded.wait(timeout=timeout)
+        if self._reused:
+            self.show()
+        return loaded
+
+    def closed(self) -> bool:
+        return self._exit.is_set() or self._closed_list[self._i].is_set()
+
+    def show(self):
+        self._q.put((self._i, 'show'))
+
+    def hide(self):
+        self._q.put((self._i, 'hide'))
+
+    def close(self):
+        cls = PyWebviewTransport
+        if self._is_closed:
+            return
+        self._is_closed = True
+        if cls._resident:
+            # Only the window is torn down: it is hidden and its page reloaded, dropping every
+            # JS object, and the next chart takes it over.
+            self._loaded.clear()
+            self._closed_list[self._i].clear()
+            self._q.put((self._i, 'reset'))
+            cls._free.append(self._i)
+            return
+        self._q.put((self._i, 'exit'))
+        self._exit.wait() if self._is_loaded else None
+        cls._process.terminate()
+        cls._reset()
+
+    def queues(self) -> dict:
+        return {'q': self._q, 'emit_q': self._emit_q, 'return_q': self._return_q}
+
+
+class HeadlessTransport(Transport):
+    """
+    An in-memory transport for tests and benchmarks: scripts are counted (and kept, unless
+    `keep_scripts` is False) instead of rendered, and events are injected with `emit`.
+    The acknowledgements requested by `AsyncChart` are answered as scripts are sent.\n
+    :param evaluator: called with the script passed to `evaluate` to produce its result.
+    """
+    def __init__(self, keep_scripts: bool = True, evaluator: callable = None):
+        self.keep_scripts = keep_scripts
+        self.evaluator = evaluator
+        self.scripts = []
+        self.sent = 0
+        self.bytes = 0
+        self._events = deque()
+        self._closed = False
+
+    def send(self, script: str, key: tuple = None):
+        self.sent += 1
+        self.bytes += len(script.encode())
+        if self.keep_scripts:
+            self.scripts.append(script)
+        if 'acknowledge(' in script:
+            for name, seq in ACKNOWLEDGE.findall(script):
+                self.emit(f'{name}_~_{seq}')
+
+    def send_batch(self, scripts: list, keys: list = None):
+        for script in scripts:
+            self.send(script)
+
+    def evaluate(self, script: str):
+        return self.evaluator(script) if self.evaluator else None
+
+    def emit(self, message: str):
+        """
+        Queues an event message, as the page would through `window.callbackFunction`.
+        """
+        self._events.append(message)
+
+    def next_event(self) -> Optional[str]:
+        return self._events.popleft() if self._events else None
+
+    def closed(self) -> bool:
+        return self._closed
+
+    def close(self):
+        self._closed = True
+
+
+WEBSOCKET_CLIENT = '''
+<script>
+(() => {
+    const socket = new WebSocket(`ws://${location.host}/ws`)
+    window.socketCallback = (message) => socket.send(JSON.stringify({event: message}))
+    const run = (script) => {
+        try {
+            return (0, eval)(script)
+        } catch (error) {
+            console.error(error)
+        }
+    }
+    socket.onmessage = (event) => {
+        const message = JSON.parse(event.data)
+        if (message.scripts) return message.scripts.forEach(run)
+        const result = run(message.script)
+        socket.send(JSON.stringify({id: message.id, result: result === undefined ? null : result}))
+    }
+})()
+</script>
+'''
+
+_WEBSOCKET_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+
+def websocket_frame(payload: bytes, opcode: int = 0x1) -> bytes:
+    length = len(payload)
+    if length < 126:
+        head = bytes((0x80 | opcode, length))
+    elif length < 65536:
+        head = bytes((0x80 | opcode, 126)) + length.to_bytes(2, 'big')
+    else:
+        head = bytes((0x80 | opcode, 127)) + length.to_bytes(8, 'big')
+    return head + payload
+
+
+async def read_websocket_message(reader: asyncio.StreamReader):
+    """
+    Reads one (possibly fragmented) message sent by a client.\n
+    :return: (opcode, payload)
+    """
+    message_opcode, chunks = None, []
+    while True:
+        first, second = await reader.readexactly(2)
+        opcode, length = first & 0x0f, second & 0x7f
+        if length == 126:
+            length = int.from_bytes(await reader.readexactly(2), 'big')
+        elif length == 127:
+            length = int.from_bytes(await reader.readexactly(8), 'big')
+        mask = await reader.readexactly(4) if second & 0x80 else None
+        payload = await reader.readexactly(length)
+        if mask:
+            key = (mask * (length // 4 + 1))[:length]
+            payload = (int.from_bytes(payload, 'big') ^ int.from_bytes(key, 'big')).to_bytes(length, 'big')
+        if opcode >= 0x8:
+            # Control frames may arrive between the fragments of a message.
+            return opcode, payload
+        message_opcode = message_opcode if opcode == 0 else opcode
+        chunks.append(payload)
+        if first & 0x80:
+            return message_opcode, b''.join(chunks)
+
+
+async def read_http_request(reader: asyncio.StreamReader):
+    """
+    :return: (path, headers) with lowercase header names.
+    """
+    head = (await reader.readuntil(b'\r\n\r\n')).decode('latin-1').split('\r\n')
+    path = urlsplit(head[0].split(' ')[1]).path
+    headers = {}
+    for line in head[1:]:
+        if ':' in line:
+            name, value = line.split(':', 1)
+            headers[name.strip().lower()] = value.strip()
+    return path, headers
+
+
+def http_response(status: str, body: bytes = b'', content_type: str = 'text/plain') -> bytes:
+    return (
+        f'HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n'
+        f'Content-Length: {len(body)}\r\nConnection: close\r\n\r\n'
+    ).encode() + body
+
+
+def websocket_accept(headers: dict) -> Optional[bytes]:
+    """
+    :return: the handshake response for a WebSocket upgrade request, or None if it is not one.
+    """
+    if headers.get('upgrade', '').lower() != 'websocket' or 'sec-websocket-key' not in headers:
+        return None
+    accept = base64.b64encode(hashlib.sha1((headers['sec-websocket-key'] + _WEBSOCKET_GUID).encode()).digest())
+    return (
+        'HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n'
+        f'Sec-WebSocket-Accept: {accept.decode()}\r\n\r\n'
+    ).encode()
+
+
+def page(template: str = None) -> bytes:
+    """
+    The chart template, with the client that evaluates scripts received over the WebSocket.
+    """
+    if template is None:
+        from .abstract import TEMPLATE as template
+    return template.replace('</body>', f'{WEBSOCKET_CLIENT}</body>', 1).encode()
+
+
+class _Client:
+    """
+    A connected page. Scripts wait in `pending` until the client's writer task sends them,
+    so a slow page never blocks the sender or the other pages.
+    """
+    def __init__(self, writer: asyncio.StreamWriter):
+        self.writer = writer
+        self.pending = deque()
+        self.wake = asyncio.Event()
+
+
+class WebSocketTransport(Transport):
+    """
+    Serves the chart template over local HTTP and sends scripts to the browser over a WebSocket.\n
+    The scripts sent are kept in a `StateLog`, so a page that connects late, or is reloaded, is brought
+    up to date. The log is compacted by script key, and series data and markers are regenerated from
+    the Python side, so it stays the size of the chart's state however long the stream runs.
+    The server runs on its own thread and event loop; each page has its own send queue, and
+    the scripts queued while it was busy are sent together as one message.\n
+    :param port: 0 picks a free port; the address is available as `url`.
+    :param open_browser: opens `url` in the default browser when the chart is shown.
+    """
+    js_api_code = 'window.socketCallback'
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, open_browser: bool = False):
+        self.open_browser = open_browser
+        self._page = page()
+        self._window = None
+        self._state = StateLog()
+        self._clients = []
+        self._lock = threading.Lock()
+        self._events = queue.Queue()
+        self._results = {}
+        self._ids = count()
+        self._connected = threading.Event()
+        self._closed = threading.Event()
+
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, daemon=True).start()
+        self._server = asyncio.run_coroutine_threadsafe(
+            asyncio.start_server(self._serve, host, port), self._loop).result()
+        self.port = self._server.sockets[0].getsockname()[1]
+        self.url = f'http://{host}:{self.port}/'
+
+    def attach(self, window):
+        self._window = window
+
+    def send(self, script: str, key: tuple = None):
+        self.send_batch([script], [key])
+
+    def send_batch(self, scripts: list, keys: list = None):
+        keys = keys or [None] * len(scripts)
+        with self._lock:
+            for script, key in zip(scripts, keys):
+                self._record(script, key)
+                for client in self._clients:
+                    client.pending.append((script, key))
+        self._loop.call_soon_threadsafe(self._wake)
+
+    def evaluate(self, script: str, timeout: float = 10):
+        future = concurrent.futures.Future()
+        request_id = next(self._ids)
+        with self._lock:
+            if not self._clients:
+                raise ConnectionError('No page is connected.')
+            self._results[request_id] = future
+            self._clients[0].pending.append((script, ('__evaluate__', request_id)))
+        self._loop.call_soon_threadsafe(self._wake)
+        return future.result(timeout)
+
+    def next_event(self) -> Optional[str]:
+        try:
+            return self._events.get_nowait()
+        except queue.Empty:
+            return None
+
+    def load(self, timeout: float = None) -> bool:
+        if self.open_browser:
+            webbrowser.open(self.url)
+        return self._connected.wait(timeout)
+
+    def closed(self) -> bool:
+        return self._closed.is_set()
+
+    def close(self):
+        if self._closed.is_set():
+            return
+        self._closed.set()
+
+        async def shutdown():
+            self._server.close()
+            for client in self._clients:
+                client.writer.close()
+            self._loop.stop()
+        asyncio.run_coroutine_threadsafe(shutdown(), self._loop)
+
+    def queues(self) -> dict:
+        return {'events': self._events}
+
+    def _record(self, script: str, key: tuple):
+        self._state.record(script, key)
+
+    def _snapshot(self) -> list:
+        """
+        :return: the scripts bringing a newly connected page up to date.
+        """
+        return self._state.scripts(self._window.registry)
+
+    def _take(self, client: _Client) -> list:
+        """
+        Empties the client's queue.\n
+        :return: the (script, key) pairs to send.
+        """
+        items = list(client.pending)
+        client.pending.clear()
+        return items
+
+    def _wake(self):
+        for client in self._clients:
+            if client.pending:
+                client.wake.set()
+
+    async def _write(self, client: _Client):
+        while True:
+            await client.wake.wait()
+            client.wake.clear()
+            with self._lock:
+                items = self._take(client)
+            batch = []
+            for script, key in items:
+                if key is not None and key[0] == '__evaluate__':
+                    if batch:
+                        client.writer.write(websocket_frame(json.dumps({'scripts': batch}).encode()))
+                        batch = []
+                    client.writer.write(websocket_frame(json.dumps({'id': key[1], 'script': script}).encode()))
+                else:
+                    batch.append(script)
+            if batch:
+                client.writer.write(websocket_frame(json.dumps({'scripts': batch}).encode()))
+            await client.writer.drain()
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            path, headers = await read_http_request(reader)
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, IndexError):
+            writer.close()
+            return
+        handshake = websocket_accept(headers)
+        if path == '/ws' and handshake:
+            writer.write(handshake)
+            await self._client(reader, writer)
+        elif path == '/':
+            writer.write(http_response('200 OK', self._page, 'text/html; charset=utf-8'))
+        else:
+            writer.write(http_response('404 Not Found'))
+        writer.close()
+
+    async def _client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        client = _Client(writer)
+        with self._lock:
+            client.pending.extend((script, None) for script in self._snapshot())
+            self._clients.append(client)
+        client.wake.set()
+        task = asyncio.create_task(self._write(client))
+        self._connected.set()
+        try:
+            while True:
+                opcode, payload = await read_websocket_message(reader)
+                if opcode == 0x8:
+                    writer.write(websocket_frame(payload[:2], 0x8))
+                    break
+                if opcode == 0x9:
+                    writer.write(websocket_frame(payload, 0xA))
+                elif opcode == 0x1:
+                    self._on_message(json.loads(payload))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            task.cancel()
+            with self._lock:
+                self._clients.remove(client)
+                if not self._clients:
+                    for future in self._results.values():
+                        future.set_exception(ConnectionError('The page disconnected.'))
+                    self._results.clear()
+
+    def _on_message(self, message: dict):
+        if 'event' in message:
+            self._events.put(message['event'])
+        elif 'id' in message:
+            with self._lock:
+                future = self._results.pop(message['id'], None)
+            if future and not future.done():
+                future.set_result(message['result'])
@@ -1,10 +1,13 @@
 import asyncio
 import json
+from collections import Counter
 from datetime import datetime
 from random import choices
 from typing import Literal, Union
 import pandas as pd
 
+from .dispatch import handler_loop
+
 
 class Pane:
     def __init__(self, window):
@@ -14,23 +17,216 @@ class Pane:
         if hasattr(self, 'id'):
             return
         self.id = Window._id_gen.generate()
+        window.registry.track(self)
 
 
-class IDGen(list):
+class IDGen(set):
     ascii = 'abcdefghijklmnopqrstuvwxyz'
 
     def generate(self):
-        var = ''.join(choices(self.ascii, k=8))
-        if var not in self:
-            self.append(var)
-            return f'window.{var}'
-        self.generate()
+        while True:
+            var = ''.join(choices(self.ascii, k=8))
+            if var not in self:
+                self.add(var)
+                return f'window.{var}'
+
+    def release(self, var: str):
+        self.discard(var[7:] if var.startswith('window.') else var)
+
+
+class Registry:
+    """
+    Tracks the JS objects and Python handlers created through a window's panes.\n
+    The registry keeps each pane alive while its JS object exists, so a pane whose result
+    was discarded still handles its events; entries are released when the pane is deleted.
+    """
+    def __init__(self, window, handlers: dict = None):
+        self._window = window
+        self.handlers = handlers if handlers is not None else {}
+        self._objects = {}
+
+    def track(self, pane):
+        self._objects[pane.id] = [type(pane).__name__, [], pane]
+
+    def add_handler(self, owner_id: str, name: str, func: callable):
+        self.handlers[name] = func
+        if owner_id in self._objects:
+            self._objects[owner_id][1].append(name)
+
+    def get(self, object_id: str):
+        """
+        :return: the live pane with the given id, or None.
+        """
+        entry = self._objects.get(object_id)
+        return entry[2] if entry else None
+
+    def panes(self) -> list:
+        """
+        :return: the live panes tracked, in creation order.
+        """
+        return [pane for _, _, pane in self._objects.values()]
+
+    def release(self, object_id: str):
+        """
+        Releases the handlers and id of a pane whose JS object has been removed.
+        """
+        entry = self._objects.pop(object_id, None)
+        if entry is None:
+            return
+        for name in entry[1]:
+            self.handlers.pop(name, None)
+        self._window._id_gen.release(object_id)
+
+    def counts(self) -> dict:
+        """
+        :return: the live object count per pane type, and the handler count.
+        """
+        return {
+            'objects': dict(Counter(kind for kind, _, _ in self._objects.values())),
+            'handlers': len(self.handlers),
+        }
+
+
+class ScriptBuffer:
+    """
+    Scripts queued before the page loads.\n
+    A script queued with a key, ``(operation, target, *other_targets)``, supersedes the
+    earlier script with the same key, so repeated `setData`, styling and option calls
+    collapse to their final state. Call `pin` when a script reads a target's state, so
+    the scripts it depends on are kept.\n
+    Scripts of the `APPEND_ONLY` operations change state incrementally; they are keyed so
+    that state snapshots can recognise them, but never supersede each other.
+    """
+    APPEND_ONLY = frozenset(('update', 'markers'))
+
+    def __init__(self):
+        self._entries = []
+        self._keys = {}
+        self._targets = {}
+        self._removed = 0
+
+    def append(self, script: str, key: tuple = None):
+        self._entries.append((script, key))
+        if key is not None and key[0] not in self.APPEND_ONLY:
+            index = self._keys.get(key)
+            if index is not None:
+                self._remove(index)
+            self._keys[key] = len(self._entries) - 1
+            for target in key[1:]:
+                self._targets.setdefault(target, set()).add(key)
+
+    def pin(self, target: str):
+        for key in self._targets.pop(target, ()):
+            self._keys.pop(key, None)
+
+    def drop(self, target: str):
+        """
+        Removes the scripts keyed on `target`, once its JS object is deleted.
+        """
+        for key in self._targets.pop(target, ()):
+            index = self._keys.pop(key, None)
+            if index is not None:
+                self._remove(index)
+
+    def _remove(self, index: int):
+        self._entries[index] = None
+        self._removed += 1
+        # The slots of superseded scripts are reclaimed once they are the majority.
+        if self._removed > 64 and self._removed * 2 > len(self._entries):
+            self._entries = [entry for entry in self._entries if entry is not None]
+            self._removed = 0
+            keys = {}
+            for i, (_, key) in enumerate(self._entries):
+                if key in self._keys:
+                    keys[key] = i
+            self._keys = keys
+
+    def clear(self):
+        self.__init__()
+
+    def __iter__(self):
+        return (entry[0] for entry in self._entries if entry is not None)
+
+    def items(self):
+        """
+        :return: the (script, key) pairs still queued, in order.
+        """
+        return [entry for entry in self._entries if entry is not None]
+
+    def __len__(self):
+        return len(self._entries) - self._removed
+
+
+class StateLog:
+    """
+    The scripts that rebuild the current state of a window on a blank page.\n
+    Keyed scripts are compacted as in `ScriptBuffer`, and a 'delete' script drops the scripts
+    keyed on its target along with itself, so the log holds the live state, however long the
+    session runs. Series data and markers are not kept as scripts; they are regenerated from
+    the live series whenever the log is rendered, where each series was first given data, so
+    the scripts reading the data always follow it and nothing needs pinning.
+    Datasets stored in the page are a cache, and are not kept at all.
+    """
+    def __init__(self):
+        self.buffer = ScriptBuffer()
+        self.data_targets = set()
+        self.marker_targets = set()
+
+    def record(self, script: str, key: tuple = None):
+        if key is None:
+            self.buffer.append(script)
+            return
+        operation = key[0]
+        if operation in ('data', 'update'):
+            for target in key[1:] if operation == 'data' else key[1:2]:
+                if target not in self.data_targets:
+                    self.buffer.append('', ('data', target))
+                    self.data_targets.add(target)
+        elif operation == 'markers':
+            self.marker_targets.add(key[1])
+        elif operation == 'delete':
+            for target in key[1:]:
+                self.buffer.drop(target)
+                self.data_targets.discard(target)
+                self.marker_targets.discard(target)
+        elif operation != 'dataset':
+            self.buffer.append(script, key)
+
+    def items(self) -> list:
+        return self.buffer.items()
+
+    def __len__(self):
+        return len(self.buffer)
+
+    def extend(self, items: list):
+        """
+        Appends the (script, key) pairs of another log.
+        """
+        for script, key in items:
+            self.record(script, tuple(key) if key is not None else None)
+
+    def scripts(self, registry: Registry) -> list:
+        scripts = []
+        for script, key in self.buffer.items():
+            if key is None or key[0] != 'data':
+                scripts.append(script)
+                continue
+            series = registry.get(key[1])
+            if series is not None:
+                scripts.append(series._data_script())
+        for target in self.marker_targets:
+            series = registry.get(target)
+            markers = series._markers_script() if series is not None else ''
+            if markers:
+                scripts.append(markers)
+        return [script for script in scripts if script]
 
 
 def parse_event_message(window, string):
     name, args = string.split('_~_')
     args = args.split(';;;')
-    func = window.handlers[name]
+    # Handlers of released panes may still receive events that were already in flight.
+    func = window.handlers.get(name, lambda *_: None)
     return func, args
 
 
@@ -44,6 +240,55 @@ def js_data(data: Union[pd.DataFrame, pd.Series]):
     return json.dumps(filtered_records, indent=2)
 
 
+class Dataset:
+    """
+    Several series sharing one time axis, serialized into a single `applyDataset` call.\n
+    The time column is encoded once; every series added references it by index and is
+    sent as columns rather than as a list of records.
+    """
+    def __init__(self, time: pd.Series):
+        self.time = time
+        self._entries = []
+
+    def add(self, series: str, columns: dict, mirror: str = None, palettes: dict = None):
+        """
+        :param series: JS reference to the series object receiving the data.
+        :param columns: field name -> values, aligned with the time axis.
+        :param mirror: JS reference to the object whose `data` attribute mirrors the series data.
+        :param palettes: field name -> (choices, index) for fields that only take a few values.
+        """
+        self._entries.append((series, mirror, columns, palettes or {}))
+
+    def script(self) -> str:
+        return f'applyDataset({self.arguments()})'
+
+    def arguments(self) -> str:
+        """
+        The time axis and series entries, as the arguments of `applyDataset` and `storeDataset`.
+        """
+        entries = []
+        for series, mirror, columns, palettes in self._entries:
+            # Each column is serialized on its own, so only one is held as a list at a time.
+            fields = '{' + ','.join(f'{_dumps(name)}:{_dumps(_column_list(values))}' for name, values in columns.items()) + '}'
+            palettes = {name: [list(choices), _column_list(index)] for name, (choices, index) in palettes.items()}
+            entries.append(
+                f'{{series: {series}, mirror: {mirror if mirror else "null"}, '
+                f'fields: {fields}, palettes: {_dumps(palettes)}}}'
+            )
+        return f'{_dumps(_column_list(self.time))}, [{", ".join(entries)}]'
+
+
+def _column_list(values) -> list:
+    if getattr(values, 'dtype', None) == object:
+        # Columns mixing the rows appended by `update` hold numpy scalars, which json cannot encode.
+        return [value.item() if hasattr(value, 'item') else value for value in values]
+    return values.tolist() if hasattr(values, 'tolist') else list(values)
+
+
+def _dumps(obj) -> str:
+    return json.dumps(obj, separators=(',', ':'))
+
+
 def jbool(b: bool): return 'true' if b is True else 'false' if b is False else None
 
 
@@ -99,11 +344,16 @@ class Emitter:
         return self
 
     def _emit(self, *args):
-        if self._callable:
-            if asyncio.iscoroutinefunction(self._callable):
-                asyncio.create_task(self._callable(*args))
-            else:
-                self._callable(*args)
+        if not self._callable:
+            return
+        loop = handler_loop()
+        if loop is not None:
+            # Emitted from a handler thread; the callback runs on the event loop instead.
+            loop.call_soon_threadsafe(self._emit, *args)
+        elif asyncio.iscoroutinefunction(self._callable):
+            asyncio.create_task(self._callable(*args))
+        else:
+            self._callable(*args)
 
 
 class JSEmitter:
@@ -119,7 +369,10 @@ class JSEmitter:
         async def final_async_wrapper(*arg):
             await other(self._chart, *arg) if not self._wrapper else await self._wrapper(other, self._chart, *arg)
 
-        self._chart.win.handlers[self._name] = final_async_wrapper if asyncio.iscoroutinefunction(other) else final_wrapper
+        self._chart.win.registry.add_handler(
+            self._chart.id, self._name,
+            final_async_wrapper if asyncio.iscoroutinefunction(other) else final_wrapper
+        )
         self._on_iadd(other)
         return self
 
@@ -133,7 +386,7 @@ class Events:
             {JS['callback']}
             makeSpinner({chart.id})
             {chart.id}.search = makeSearchBox({chart.id})
-            ''')
+            ''', key=('search', chart.id))
         )
         self.range_change = JSEmitter(chart, f'range_change{chart.id}',
             lambda o: chart.run_script(f'''
@@ -146,7 +399,7 @@ class Events:
                 setTimeout(() => {chart.id}.chart.timeScale().subscribeVisibleLogicalRangeChange(checkLogicalRange), 50)
             }}
             {chart.id}.chart.timeScale().subscribeVisibleLogicalRangeChange(checkLogicalRange)
-            '''),
+            ''', key=('range_change', chart.id)),
             wrapper=lambda o, c, *arg: o(c, *[float(a) for a in arg])
         )
 
@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+
+from lightweight_charts import Chart, HeadlessTransport
+from lightweight_charts.cache import PayloadCache
+
+
+def bars(n, start='2021-01-01'):
+    close = np.linspace(100, 110, n)
+    return pd.DataFrame({'time': pd.date_range(start, periods=n, freq='min'),
+                         'open': close, 'high': close + 1, 'low': close - 1, 'close': close})
+
+
+def test_evicts_least_recently_used():
+    cache = PayloadCache(max_bytes=100)
+    for key in 'abc':
+        cache.put((key,), key, 40)
+    assert cache.get(('a',)) is None and len(cache) == 2
+    assert cache.get(('b',)) == 'b'
+    cache.put(('d',), 'd', 40)
+    # 'b' was used last, so 'c' goes.
+    assert cache.get(('c',)) is None and cache.get(('b',)) == 'b'
+    assert cache.stats()['evictions'] == 2 and cache.bytes == 80
+    cache.put(('e',), 'e', 101)
+    assert cache.get(('e',)) is None and cache.bytes == 80
+
+
+def test_set_reuses_the_payload():
+    chart = Chart(transport=HeadlessTransport())
+    chart.show()
+    try:
+        one, two = bars(500), bars(500, '2022-01-01')
+        for df in (one, two, one):
+            chart.set(df)
+        stats = chart.win.payloads.stats()
+        assert (stats['hits'], stats['misses'], stats['entries']) == (1, 2, 2)
+        assert chart._transport.scripts[-1] == next(s for s in chart._transport.scripts if 'applyDataset(' in s)
+    finally:
+        chart.exit()
@@ -0,0 +1,98 @@
+import asyncio
+import threading
+
+from lightweight_charts.dispatch import Dispatcher, check_cancelled
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_sync_handlers_run_inline_by_default():
+    dispatcher, calls = Dispatcher(), []
+
+    async def main():
+        assert await dispatcher.dispatch('h', lambda x: calls.append((x, threading.current_thread())), [1]) is None
+    run(main())
+    assert calls == [(1, threading.main_thread())]
+
+
+def test_coroutine_handlers_overlap_by_default():
+    dispatcher, running = Dispatcher(), []
+
+    async def handler(i):
+        running.append(i)
+        await asyncio.sleep(0.05)
+
+    async def main():
+        tasks = [await dispatcher.dispatch('h', handler, [i]) for i in range(3)]
+        assert all(isinstance(task, asyncio.Task) for task in tasks)
+        await asyncio.sleep(0.01)
+        # Every invocation started before the first finished.
+        assert running == [0, 1, 2]
+        await asyncio.gather(*tasks)
+    run(main())
+
+
+def test_serial_keeps_the_event_order():
+    dispatcher, order = Dispatcher(), []
+    dispatcher.set_policy('h', 'serial')
+
+    async def handler(i):
+        await asyncio.sleep(0.03 - i * 0.01)
+        order.append(i)
+
+    async def main():
+        tasks = [await dispatcher.dispatch('h', handler, [i]) for i in range(3)]
+        await asyncio.gather(*tasks)
+    run(main())
+    assert order == [0, 1, 2]
+
+
+def test_concurrent_sync_handlers_use_worker_threads():
+    dispatcher, threads = Dispatcher(), set()
+    dispatcher.set_policy('h', 'concurrent')
+    barrier = threading.Barrier(2, timeout=5)
+
+    def handler():
+        barrier.wait()
+        threads.add(threading.current_thread())
+
+    async def main():
+        await asyncio.gather(*[await dispatcher.dispatch('h', handler, []) for _ in range(2)])
+    run(main())
+    dispatcher.shutdown()
+    assert len(threads) == 2 and threading.main_thread() not in threads
+
+
+def test_latest_cancels_stale_invocations():
+    dispatcher, done = Dispatcher(), []
+    dispatcher.set_policy('h', 'latest')
+    started = threading.Event()
+
+    def handler(i):
+        started.set()
+        for _ in range(100):
+            check_cancelled()
+            threading.Event().wait(0.01)
+        done.append(i)
+
+    async def main():
+        first = await dispatcher.dispatch('h', handler, [0])
+        await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+        second = await dispatcher.dispatch('h', handler, [1])
+        await asyncio.gather(first, second)
+    run(main())
+    dispatcher.shutdown()
+    assert done == [1]
+
+
+def test_internal_handlers_stay_inline():
+    dispatcher = Dispatcher(default='concurrent')
+
+    async def handler():
+        pass
+
+    async def main():
+        assert await dispatcher.dispatch('__internal', handler, []) is None
+    run(main())
@@ -0,0 +1,54 @@
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from lightweight_charts import Chart, HeadlessTransport
+
+
+def bars(n):
+    close = np.linspace(100, 110, n)
+    return pd.DataFrame({'time': pd.date_range('2021-01-01', periods=n, freq='min'),
+                         'open': close, 'high': close + 1, 'low': close - 1, 'close': close})
+
+
+@pytest.fixture
+def chart():
+    chart = Chart(transport=HeadlessTransport())
+    chart.show()
+    yield chart
+    chart.exit()
+
+
+def test_loads_every_chunk(chart):
+    progress = []
+    load = chart.set_progressive(bars(10_500), chunk_size=1000, on_progress=lambda n, total: progress.append(n))
+    assert load.wait(10) and load.error is None
+    assert len(chart.candle_data) == 10_500
+    assert chart.candle_data['time'].is_monotonic_increasing
+    assert progress[0] == 1000 and progress[-1] == 10_500
+    scripts = chart._transport.scripts
+    assert sum('prependDataset(' in script for script in scripts) == 10
+    # The chunks are merged as they double the data shown, not one by one.
+    assert sum(script.rstrip().endswith('true)') for script in scripts if 'prependDataset(' in script) == 4
+
+
+def test_cancel_keeps_the_chunks_received(chart):
+    # Cancelled from the loading thread, once three chunks are in.
+    load = chart.set_progressive(bars(10_000), chunk_size=1000,
+                                 on_progress=lambda n, total: n >= 3000 and chart._load.cancel())
+    assert load.wait(10) and load.cancelled
+    assert len(chart.candle_data) == 3000
+    assert 'mergeChunks(' in chart._transport.scripts[-1]
+    assert chart.candle_data['time'].iloc[-1] == bars(10_000)['time'].iloc[-1].timestamp()
+    assert chart.candle_data['time'].is_monotonic_increasing
+
+
+def test_set_cancels_the_load(chart):
+    started = threading.Event()
+    load = chart.set_progressive(bars(50_000), chunk_size=1000, on_progress=lambda n, total: started.set())
+    started.wait(10)
+    chart.set(bars(10))
+    assert load.wait(10) and load.cancelled
+    assert len(chart.candle_data) == 10
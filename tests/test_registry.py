@@ -0,0 +1,28 @@
+import pandas as pd
+import pytest
+
+from lightweight_charts import Chart, HeadlessTransport
+
+
+@pytest.fixture
+def chart():
+    chart = Chart(transport=HeadlessTransport(keep_scripts=False))
+    chart.set(pd.DataFrame({'time': pd.date_range('2021-01-01', periods=10, freq='D'),
+                            'open': 1., 'high': 2., 'low': 0., 'close': 1.5}))
+    chart.show()
+    yield chart
+    chart.exit()
+
+
+def test_removed_horizontal_lines_are_released(chart):
+    size = len(chart.win.state)
+    for price in (1, 2, 2, 3):
+        chart.horizontal_line(price, func=lambda line: None)
+    assert chart.win.registry.counts()['objects']['HorizontalLine'] == 4
+    chart.remove_horizontal_line(2)
+    assert chart.win.registry.counts()['objects']['HorizontalLine'] == 2
+    assert chart.win.registry.counts()['handlers'] == 2
+    chart.clear_horizontal_lines()
+    assert 'HorizontalLine' not in chart.win.registry.counts()['objects']
+    assert chart.win.registry.counts()['handlers'] == 0
+    assert len(chart.win.state) == size
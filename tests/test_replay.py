@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from lightweight_charts import Chart, HeadlessTransport
+
+
+def bars(n, start='2021-01-01'):
+    close = np.linspace(100, 110, n)
+    return pd.DataFrame({'time': pd.date_range(start, periods=n, freq='min'),
+                         'open': close, 'high': close + 1, 'low': close - 1, 'close': close, 'volume': 10.})
+
+
+@pytest.fixture
+def chart():
+    chart = Chart(transport=HeadlessTransport())
+    chart.show()
+    yield chart
+    chart.exit()
+
+
+def test_replay_seek_and_step(chart):
+    source = bars(100)
+    replay = chart.replay(source, start=source['time'].iloc[10])
+    try:
+        replay.pause()
+        replay.seek(source['time'].iloc[40])
+        replay.step(5)
+        for _ in range(100):
+            if replay.position == 45:
+                break
+            replay._done.wait(0.05)
+        assert replay.position == 45 and replay.paused
+        assert len(chart.candle_data) == 45
+        assert chart._last_bar['time'] == source['time'].iloc[44].timestamp()
+        replay.seek(source['time'].iloc[20])
+        for _ in range(100):
+            if replay.position == 20:
+                break
+            replay._done.wait(0.05)
+        assert len(chart.candle_data) == 20
+    finally:
+        replay.stop()
+        replay.wait(5)
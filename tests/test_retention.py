@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from lightweight_charts import Chart, HeadlessTransport
+
+
+def bars(n, start='2021-01-01'):
+    close = np.linspace(100, 110, n)
+    return pd.DataFrame({'time': pd.date_range(start, periods=n, freq='min'),
+                         'open': close, 'high': close + 1, 'low': close - 1, 'close': close, 'volume': 10.})
+
+
+@pytest.fixture
+def chart():
+    chart = Chart(transport=HeadlessTransport())
+    chart.show()
+    yield chart
+    chart.exit()
+
+
+def test_retention_trims_bars_and_lines(chart):
+    df = bars(100)
+    chart.set(df)
+    line = chart.create_line('sma')
+    line.set(pd.DataFrame({'time': df['time'], 'sma': 105.}))
+    chart.retention(max_bars=50, batch=0.2)
+    assert len(chart.candle_data) == 50 and len(line.data) == 50
+    assert any(script.startswith(f'trimSeries({chart.id}') for script in chart._transport.scripts)
+    streamed = bars(200).iloc[100:]
+    for i in range(len(streamed)):
+        chart.update(streamed.iloc[i])
+    # Trimmed once the window is exceeded by a fifth of its size, never below it.
+    assert 50 <= len(chart.candle_data) <= 60
+    assert chart.candle_data['time'].iloc[-1] == streamed['time'].iloc[-1].timestamp()
+    # The line was not streamed, so all of it fell out of the window.
+    assert line.data.empty
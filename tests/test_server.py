@@ -0,0 +1,74 @@
+import asyncio
+import json
+from urllib.parse import urlsplit
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from lightweight_charts import Chart, ChartServer
+from lightweight_charts.transport import read_websocket_message
+
+
+def bars(n):
+    close = np.linspace(100, 110, n)
+    return pd.DataFrame({'time': pd.date_range('2021-01-01', periods=n, freq='min'),
+                         'open': close, 'high': close + 1, 'low': close - 1, 'close': close})
+
+
+@pytest.fixture
+def served():
+    server = ChartServer()
+    chart = Chart(transport=server)
+    chart.set(bars(100))
+    chart.show()
+    yield chart, server
+    chart.exit()
+
+
+async def connect(url: str):
+    address = urlsplit(url)
+    reader, writer = await asyncio.open_connection(address.hostname, address.port)
+    writer.write(
+        b'GET /ws HTTP/1.1\r\nHost: localhost\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n'
+        b'Sec-WebSocket-Key: dGhlIHNhbXBsZSBub25jZQ==\r\nSec-WebSocket-Version: 13\r\n\r\n'
+    )
+    head = await reader.readuntil(b'\r\n\r\n')
+    assert head.startswith(b'HTTP/1.1 101')
+    return reader, writer
+
+
+async def receive(reader) -> list:
+    opcode, payload = await asyncio.wait_for(read_websocket_message(reader), 5)
+    assert opcode == 0x1
+    return json.loads(payload)['scripts']
+
+
+def test_snapshot_then_deltas(served):
+    chart, server = served
+    chart.marker(text='a')
+
+    async def run():
+        reader, writer = await connect(server.url)
+        snapshot = await receive(reader)
+        assert any(script.startswith('applyDataset(') for script in snapshot)
+        assert any('markers.replace' in script for script in snapshot)
+        chart.update(bars(101).iloc[-1])
+        deltas = await receive(reader)
+        assert any('series.update(' in script for script in deltas)
+        assert not any(script.startswith('applyDataset(') for script in deltas)
+        writer.close()
+    asyncio.run(run())
+
+
+def test_snapshot_stays_flat_while_streaming(served):
+    chart, server = served
+    chart.fit()
+    size = len(server._snapshot())
+    streamed = bars(1100).iloc[100:]
+    for i in range(len(streamed)):
+        chart.update(streamed.iloc[i])
+        chart.fit()
+        chart.candle_style(up_color=f'#{i % 10}00000')
+    assert len(server._snapshot()) == size + 1
+    assert len(server._state) == len(server._snapshot())
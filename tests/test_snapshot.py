@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from lightweight_charts import Chart, HeadlessTransport
+
+
+def bars(n, start='2021-01-01'):
+    close = np.linspace(100, 110, n)
+    return pd.DataFrame({'time': pd.date_range(start, periods=n, freq='min'),
+                         'open': close, 'high': close + 1, 'low': close - 1, 'close': close, 'volume': 10.})
+
+
+@pytest.fixture
+def chart():
+    chart = Chart(transport=HeadlessTransport(keep_scripts=False))
+    chart.set(bars(100))
+    chart.show()
+    yield chart
+    chart.exit()
+
+
+def test_save_restore(chart, tmp_path):
+    line = chart.create_line('sma')
+    line.set(pd.DataFrame({'time': chart.candle_data['time'] * 10 ** 9, 'sma': 105.}))
+    chart.marker(text='a')
+    chart.horizontal_line(103)
+    chart.topbar.textbox('sym', 'AAPL')
+    chart.update(bars(101).iloc[-1])
+    path = chart.snapshot(str(tmp_path / 'chart.npz'))
+
+    restored = Chart.restore(path, transport=HeadlessTransport())
+    try:
+        pd.testing.assert_frame_equal(restored.candle_data.astype(float), chart.candle_data.astype(float))
+        assert restored._lines[0].name == 'sma'
+        assert restored.topbar['sym'].value == 'AAPL'
+        assert [key for _, key in restored.win.state.items()] == [key for _, key in chart.win.state.items()]
+    finally:
+        restored.exit()
+
+
+def test_deleted_panes_leave_the_log(chart):
+    times = chart.candle_data['time']
+    size = len(chart.win.state)
+    for i in range(200):
+        chart.vertical_span(times.iloc[5], times.iloc[9]).delete()
+        chart.horizontal_line(100 + i).delete()
+        chart.trend_line(times.iloc[1], 1, times.iloc[8], 2).delete()
+        chart.set_visible_range(times.iloc[i % 50], times.iloc[90])
+    assert len(chart.win.state) <= size + 1
+    assert chart.win.registry.counts()['handlers'] == 0
+
+
+def test_log_stays_compact_while_streaming(chart):
+    df = bars(100)
+    for i in range(200):
+        chart.set(df)
+        chart.update(bars(101).iloc[-1])
+        chart.fit()
+        chart.candle_style(up_color=f'#{i % 10}00000')
+    assert len(chart.win.state.scripts(chart.win.registry)) <= len(chart.win.state) <= 10
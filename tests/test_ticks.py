@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from lightweight_charts import Chart, HeadlessTransport
+
+
+def bars(n, start='2021-01-01'):
+    close = np.linspace(100, 110, n)
+    return pd.DataFrame({'time': pd.date_range(start, periods=n, freq='min'),
+                         'open': close, 'high': close + 1, 'low': close - 1, 'close': close, 'volume': 10.})
+
+
+@pytest.fixture
+def chart():
+    chart = Chart(transport=HeadlessTransport())
+    chart.show()
+    yield chart
+    chart.exit()
+
+
+def test_ticks_continue_the_last_bar(chart):
+    chart.set(bars(10))
+    last = chart._last_bar.copy()
+    start = pd.Timestamp(last['time'], unit='s')
+    ticks = pd.DataFrame({
+        'time': [start + pd.Timedelta(seconds=s) for s in (10, 20, 70, 80, 130)],
+        'price': [120., 90., 101., 103., 102.],
+        'volume': [1., 2., 3., 4., 5.],
+    })
+    chart.update_from_ticks(ticks, cumulative_volume=True)
+    data = chart.candle_data.astype(float)
+    assert len(data) == 12
+    first = data.iloc[-3]
+    assert (first['open'], first['high'], first['low'], first['close']) == (last['open'], 120., 90., 90.)
+    assert first['volume'] == last['volume'] + 3
+    assert tuple(data.iloc[-2][['open', 'high', 'low', 'close', 'volume']]) == (101., 103., 101., 103., 7.)
+    assert chart._last_bar['close'] == 102.
+    assert sum('updateDataset(' in script for script in chart._transport.scripts) == 1
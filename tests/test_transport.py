@@ -0,0 +1,50 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pytest
+
+from lightweight_charts import Chart, HeadlessTransport
+from lightweight_charts.transport import StubWindow
+
+
+def bars(n):
+    return pd.DataFrame({'time': pd.date_range('2021-01-01', periods=n, freq='D'),
+                         'open': 1., 'high': 2., 'low': 0., 'close': 1.5})
+
+
+def test_headless_round_trip():
+    transport = HeadlessTransport(evaluator=lambda script: f'result of {script}')
+    chart = Chart(transport=transport)
+    chart.set(bars(10))
+    assert transport.sent == 0
+    clicks = []
+    chart.topbar.button('b', 'B', func=lambda c: clicks.append(c.topbar['b'].value))
+
+    async def run():
+        await chart.show_async()
+        sent = transport.sent
+        transport.emit(f"{chart.topbar['b'].id}_~_B")
+        await asyncio.sleep(0.2)
+        chart.update(bars(11).iloc[-1])
+        assert transport.sent == sent + 1
+        chart.exit()
+
+    asyncio.run(run())
+    assert len(transport.scripts) == transport.sent
+    assert any(script.count('applyDataset(') for script in transport.scripts)
+    assert clicks == ['B']
+    assert chart.win.evaluate('1 + 1') == 'result of 1 + 1'
+
+
+def test_concurrent_evaluate_gets_its_own_result(monkeypatch):
+    # The stub page answers every expression with the expression itself.
+    monkeypatch.setattr(StubWindow, 'evaluate_js', lambda self, script: script, raising=True)
+    chart = Chart(headless=True)
+    chart.show()
+    try:
+        with ThreadPoolExecutor(8) as pool:
+            results = list(pool.map(chart.win.evaluate, (str(i) for i in range(400))))
+        assert results == [str(i) for i in range(400)]
+    finally:
+        chart.exit()
@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from lightweight_charts import Chart, HeadlessTransport
+from lightweight_charts import timecodec
+
+
+TIMES = pd.date_range('2021-01-04', periods=3, freq='D')
+SECONDS = [1609718400, 1609804800, 1609891200]
+
+
+@pytest.fixture
+def chart():
+    chart = Chart(transport=HeadlessTransport())
+    chart.set(pd.DataFrame({'time': pd.date_range('2021-01-01', periods=10, freq='D'),
+                            'open': 1., 'high': 2., 'low': 0., 'close': 1.}))
+    yield chart
+    chart.exit()
+
+
+@pytest.mark.parametrize('times', [TIMES, pd.Series(TIMES), TIMES.to_numpy(), list(TIMES)])
+def test_vertical_span_array_like(chart, times):
+    span = chart.vertical_span(times)
+    assert span._end == SECONDS[-1]
+    script = chart.win.scripts.items()[-1][0]
+    assert all(f"'time': {seconds}" in script for seconds in SECONDS)
+
+
+def test_nan_times_are_rejected():
+    with pytest.raises(ValueError):
+        timecodec.to_nanoseconds_array(np.array([1609718400., np.nan]))